@@ -0,0 +1,137 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+
+from portfolio_optimizer import FREQUENCIES, PortfolioOptimizer, annual_to_daily_return
+
+
+# Walk-forward backtest of the optimizer strategies. At every rebalance date
+# the optimizer is fitted on the returns before that date (expanding, or the
+# last `train_window` bars) and the weights are held over the following test
+# window. All windows are slices of one returns matrix; with n_jobs > 1 the
+# matrix is sent once to each worker process and windows are run in chunks.
+# The serial path passes the matrix directly: nothing is left in module
+# state, so concurrent callers (e.g. Streamlit sessions) never share it.
+
+STRATEGIES = ("min_risk", "target_return")
+
+METRICS = ("expected_return", "expected_risk", "realized_return", "realized_risk", "benchmark_risk", "sum_weights")
+
+_shared = {}
+
+
+def rebalance_schedule(index, every="Y", start=None, end=None):
+    # First trading day of each period in index; every is a pandas period
+    # alias ("Y", "Q", "M", "W", or "D" for a daily rebalance)
+    index = pd.DatetimeIndex(index)
+    dates = pd.Series(index, index=index)
+    if start is not None:
+        dates = dates[dates >= pd.Timestamp(start)]
+    if end is not None:
+        dates = dates[dates < pd.Timestamp(end)]
+    return pd.DatetimeIndex(dates.groupby(dates.index.to_period(every)).min().values)
+
+
+def _windows(index, rebalance_dates, train_window, test_window, min_train):
+    positions = np.searchsorted(index.values, pd.DatetimeIndex(rebalance_dates).values, "left")
+    positions = np.unique(positions[positions < len(index)])
+    windows = []
+    for i, pos in enumerate(positions):
+        train_lo = 0 if train_window is None else max(0, pos - train_window)
+        if test_window is not None:
+            test_hi = min(len(index), pos + test_window)
+        else:
+            test_hi = positions[i + 1] if i + 1 < len(positions) else len(index)
+        if pos - train_lo >= min_train and test_hi - pos >= 2:
+            windows.append((train_lo, pos, pos, test_hi))
+    return windows
+
+
+def _init_worker(values, index, columns, config):
+    # Pool initializer: one copy of the matrix per worker process
+    _shared.update(values=values, index=index, columns=columns, config=config)
+
+
+def _run_worker_windows(windows):
+    return _run_windows(windows, **_shared)
+
+
+def _run_windows(windows, values, index, columns, config):
+    periods_per_year = config["periods_per_year"]
+    rows = []
+    for train_lo, train_hi, test_lo, test_hi in windows:
+        train = pd.DataFrame(values[train_lo:train_hi], index=index[train_lo:train_hi], columns=columns)
+        test = values[test_lo:test_hi]
+        optimizer = PortfolioOptimizer.from_returns(train, riskFreeRate=config["riskFreeRate"], frequency=config["frequency"])
+        for strategy in config["strategies"]:
+            row = {
+                "train_start": index[train_lo],
+                "train_end": index[train_hi - 1],
+                "test_start": index[test_lo],
+                "test_end": index[test_hi - 1],
+                "strategy": strategy,
+            }
+            try:
+                if strategy == "min_risk":
+                    weights = optimizer.singleEquationSolver()
+                else:
+                    weights = optimizer.markowitz_optimal_weights_specific_return(config["daily_target"])
+            except ValueError as e:
+                # e.g. no asset had a positive mean over this training window:
+                # the window gets a NaN row instead of ending the run
+                row.update(dict.fromkeys(METRICS, np.nan), error=str(e))
+                rows.append(row)
+                continue
+            # Benchmark: equal weights with the same total exposure
+            benchmark = np.full(len(weights), weights.sum() / len(weights))
+            realized = test @ weights
+            row.update({
+                "expected_return": optimizer.portfolioReturn(weights),
+                "expected_risk": optimizer.riskFunction(weights),
+                "realized_return": realized.mean() * periods_per_year,
+                "realized_risk": realized.var(ddof=1) * periods_per_year,
+                "benchmark_risk": (test @ benchmark).var(ddof=1) * periods_per_year,
+                "sum_weights": weights.sum(),
+                "error": None,
+            })
+            rows.append(row)
+    return rows
+
+
+def walk_forward(returns, rebalance_dates, strategies=STRATEGIES, target_return=7.0, train_window=None,
+                 test_window=None, min_train=60, riskFreeRate=0.044, frequency="daily", n_jobs=1, chunk_size=None):
+    # returns: log returns (dates x tickers), e.g. PortfolioOptimizer.returns.
+    # target_return is annual in percent, as entered on the portfolio page.
+    # Returns one row per (rebalance date, strategy); a strategy that cannot
+    # be solved on a window gets NaN metrics and the reason in "error".
+    for strategy in strategies:
+        if strategy not in STRATEGIES:
+            raise ValueError(f"Unknown strategy '{strategy}'. Use one of {list(STRATEGIES)}.")
+    index = pd.DatetimeIndex(returns.index)
+    values = np.ascontiguousarray(returns.to_numpy(dtype=float))
+    periods_per_year = FREQUENCIES[frequency][0]
+    config = {
+        "strategies": tuple(strategies),
+        "daily_target": annual_to_daily_return(target_return, periods_per_year),
+        "riskFreeRate": riskFreeRate,
+        "frequency": frequency,
+        "periods_per_year": periods_per_year,
+    }
+    windows = _windows(index, rebalance_dates, train_window, test_window, min_train)
+    if not windows:
+        return pd.DataFrame()
+
+    if n_jobs is None:
+        n_jobs = os.cpu_count() or 1
+    if n_jobs <= 1 or len(windows) < 2 * n_jobs:
+        rows = _run_windows(windows, values, index, list(returns.columns), config)
+    else:
+        chunk_size = chunk_size or max(1, len(windows) // (4 * n_jobs))
+        chunks = [windows[i:i + chunk_size] for i in range(0, len(windows), chunk_size)]
+        with ProcessPoolExecutor(n_jobs, initializer=_init_worker, initargs=(values, index, list(returns.columns), config)) as pool:
+            rows = [row for chunk in pool.map(_run_worker_windows, chunks) for row in chunk]
+
+    result = pd.DataFrame(rows)
+    result["risk_improvement_pct"] = (result["benchmark_risk"] / result["realized_risk"] - 1) * 100
+    return result
@@ -0,0 +1,155 @@
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+
+from optimizer_registry import SharedCache
+from portfolio_optimizer import PortfolioOptimizer, annual_to_daily_return, load_prices
+
+
+# Headless batch runner: optimizes many client portfolios from a jobs file
+# without Streamlit.
+#
+#   python batch.py jobs.csv -o allocations.parquet --workers 8
+#
+# Jobs file (CSV, JSON lines or Parquet) columns:
+#   job_id         optional, defaults to the row number
+#   tickers        "AAPL JNJ PG" (space, comma or semicolon separated)
+#   start, end     price window, [start, end)
+#   target_return  annual % (blank -> minimum-risk portfolio)
+#   budget         money to allocate
+# Prices for the union of all tickers and windows are loaded once in the
+# parent process and handed to each worker when it starts; workers build one
+# optimizer per distinct (tickers, start, end) and reuse it across jobs. The
+# module-level state only exists in pool processes; a serial run keeps its
+# own.
+
+OUTPUT_COLUMNS = ["job_id", "strategy", "ticker", "weight", "investment",
+                  "expected_return", "risk", "error"]
+
+_worker = {}
+
+
+def read_jobs(path):
+    ext = os.path.splitext(path)[1].lower()
+    if ext == ".parquet":
+        jobs = pd.read_parquet(path)
+    elif ext in (".json", ".jsonl", ".ndjson"):
+        jobs = pd.read_json(path, lines=ext != ".json")
+    else:
+        jobs = pd.read_csv(path)
+    if "job_id" not in jobs.columns:
+        jobs["job_id"] = np.arange(len(jobs))
+    if "target_return" not in jobs.columns:
+        jobs["target_return"] = np.nan
+    missing = {"tickers", "start", "end", "budget"} - set(jobs.columns)
+    if missing:
+        raise ValueError(f"Jobs file is missing columns: {', '.join(sorted(missing))}")
+    jobs["tickers"] = jobs["tickers"].map(parse_tickers)
+    jobs["start"] = jobs["start"].astype(str)
+    jobs["end"] = jobs["end"].astype(str)
+    return jobs
+
+
+def parse_tickers(value):
+    if isinstance(value, (list, tuple, np.ndarray)):
+        value = " ".join(str(t) for t in value)
+    # Duplicates dropped, order kept
+    return tuple(dict.fromkeys(str(value).replace(",", " ").replace(";", " ").split()))
+
+
+def write_allocations(allocations, path):
+    if os.path.splitext(path)[1].lower() == ".parquet":
+        allocations.to_parquet(path, index=False)
+    else:
+        allocations.to_csv(path, index=False)
+
+
+def _worker_state(prices, riskFreeRate):
+    return {"prices": prices, "riskFreeRate": riskFreeRate, "optimizers": SharedCache(max_entries=64, ttl=None)}
+
+
+def _init_worker(prices, riskFreeRate):
+    _worker.update(_worker_state(prices, riskFreeRate))
+
+
+def _optimizer_for(state, tickers, start, end):
+    def build():
+        prices = state["prices"]
+        missing = [t for t in tickers if t not in prices.columns]
+        if missing:
+            raise KeyError(f"No price data for {', '.join(missing)}")
+        window = prices.loc[(prices.index >= pd.Timestamp(start)) & (prices.index < pd.Timestamp(end)), list(tickers)]
+        return PortfolioOptimizer.from_prices(window.dropna(how="all"), riskFreeRate=state["riskFreeRate"])
+    return state["optimizers"].get_or_create((tickers, start, end), build)
+
+
+def run_job(job, state=None):
+    # state: from _worker_state(); defaults to this pool process's
+    state = _worker if state is None else state
+    rows = []
+    try:
+        optimizer = _optimizer_for(state, job["tickers"], job["start"], job["end"])
+        budget = float(job["budget"])
+        if pd.isna(job["target_return"]):
+            strategy = "min_risk"
+            weights = optimizer.singleEquationSolver()
+        else:
+            strategy = "target_return"
+            weights = optimizer.markowitz_optimal_weights_specific_return(annual_to_daily_return(float(job["target_return"])))
+        expected_return = optimizer.portfolioReturn(weights)
+        risk = optimizer.riskFunction(weights)
+        for ticker, weight in zip(optimizer.pBar.index, weights):
+            rows.append((job["job_id"], strategy, ticker, weight, weight * budget, expected_return, risk, None))
+    except Exception as e:
+        rows.append((job["job_id"], None, None, np.nan, np.nan, np.nan, np.nan, f"{type(e).__name__}: {e}"))
+    return rows
+
+
+def _run_chunk(jobs, state=None):
+    return [row for job in jobs for row in run_job(job, state)]
+
+
+def run_batch(jobs, excel_file="stock_data.xlsx", riskFreeRate=0.044, workers=None, chunk_size=64, prices=None):
+    # jobs: DataFrame as returned by read_jobs(). Returns the allocations in
+    # long format (one row per job and ticker, or one error row per job).
+    if prices is None:
+        tickers = sorted({t for universe in jobs["tickers"] for t in universe})
+        prices = load_prices(tickers, jobs["start"].min(), jobs["end"].max(), excel_file)
+    # Same universe next to each other so a worker reuses its optimizer
+    order = jobs.assign(_universe=jobs["tickers"].map(" ".join)).sort_values(["_universe", "start", "end"], kind="stable")
+    records = order.drop(columns="_universe").to_dict("records")
+    chunks = [records[i:i + chunk_size] for i in range(0, len(records), chunk_size)]
+
+    workers = workers or os.cpu_count() or 1
+    if workers <= 1 or len(chunks) == 1:
+        state = _worker_state(prices, riskFreeRate)
+        rows = [row for chunk in chunks for row in _run_chunk(chunk, state)]
+    else:
+        with ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(prices, riskFreeRate)) as pool:
+            rows = [row for result in pool.map(_run_chunk, chunks) for row in result]
+    return pd.DataFrame(rows, columns=OUTPUT_COLUMNS)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Optimize many portfolios from a jobs file without the Streamlit app.")
+    parser.add_argument("jobs", help="CSV, JSON lines or Parquet file of jobs")
+    parser.add_argument("-o", "--output", default="allocations.csv", help="CSV or Parquet output file")
+    parser.add_argument("--excel", default="stock_data.xlsx", help="Excel backup used when downloads fail")
+    parser.add_argument("--risk-free", type=float, default=0.044)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--chunk-size", type=int, default=64)
+    args = parser.parse_args(argv)
+
+    t0 = time.perf_counter()
+    jobs = read_jobs(args.jobs)
+    allocations = run_batch(jobs, args.excel, args.risk_free, args.workers, args.chunk_size)
+    write_allocations(allocations, args.output)
+    failed = allocations.loc[allocations["error"].notna(), "job_id"].nunique()
+    print(f"{len(jobs)} jobs ({failed} failed) -> {args.output} in {time.perf_counter() - t0:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Import-time budget for the library modules. Each module is imported in a
+# fresh interpreter after NumPy and pandas (which every page needs anyway), so
+# the measured time is what the module itself adds. A module fails the budget
+# if it pulls in one of the heavy optional packages at import time or adds more
+# than its allowance.
+#   python benchmarks/bench_imports.py            per-module report
+#   python benchmarks/bench_imports.py --check    exit 1 when over budget
+# Heavy packages the baseline already loads (pandas may load pyarrow) are not
+# counted against the module.
+
+HEAVY = ("streamlit", "yfinance", "matplotlib", "plotly", "scipy", "PIL", "pyarrow", "openpyxl")
+
+BUDGET_MS = {
+    "portfolio_optimizer": 40,
+    "optimizer_registry": 40,
+    "backtest": 40,
+    "price_cache": 20,
+    "price_fetch": 30,
+    "columnar_prices": 20,
+    "rolling_stats": 20,
+    "covariance": 20,
+    "instrumentation": 20,
+    "streaming": 30,
+}
+
+_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|(\s+)(\S+)")
+
+
+def measure(module, repeat=3):
+    # Returns (cumulative import time in ms, top transitive imports, heavy
+    # packages loaded); the fastest of `repeat` fresh interpreters.
+    code = (
+        "import json, sys, numpy, pandas\n"
+        f"before = set(m for m in {HEAVY!r} if m in sys.modules)\n"
+        "sys.stderr.write('--- baseline done ---\\n')\n"
+        f"import {module}\n"
+        f"print(json.dumps(sorted(m for m in {HEAVY!r} if m in sys.modules and m not in before)))\n"
+    )
+    best = None
+    for _ in range(repeat):
+        result = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", code],
+            cwd=ROOT, capture_output=True, text=True, check=True,
+        )
+        timings = {}
+        for match in _LINE.finditer(result.stderr.split("--- baseline done ---")[-1]):
+            timings[match.group(4)] = int(match.group(2)) / 1000
+        total = timings.get(module, 0.0)
+        if best is None or total < best[0]:
+            heavy = json.loads(result.stdout.strip().splitlines()[-1])
+            top = sorted(((ms, name) for name, ms in timings.items() if name != module), reverse=True)[:5]
+            best = (total, top, heavy)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-module import time and budget check")
+    parser.add_argument("--check", action="store_true", help="exit with status 1 if any module is over budget")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    failures = []
+    print(f"{'module':<22} {'import (ms)':>11} {'budget (ms)':>11}  heavy imports / slowest dependencies")
+    for module, budget in BUDGET_MS.items():
+        total, top, heavy = measure(module, args.repeat)
+        status = "ok"
+        if heavy:
+            status = "heavy: " + ", ".join(heavy)
+            failures.append(module)
+        elif total > budget:
+            status = "over budget"
+            failures.append(module)
+        slowest = ", ".join(f"{name} {ms:.1f}" for ms, name in top[:3])
+        print(f"{module:<22} {total:>11.1f} {budget:>11}  {status}; {slowest}")
+
+    if args.check and failures:
+        print(f"Import budget exceeded by: {', '.join(failures)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
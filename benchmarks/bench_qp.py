@@ -0,0 +1,92 @@
+import argparse
+import os
+import sys
+import time
+import numpy as np
+from scipy.optimize import minimize
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from portfolio_optimizer import CovarianceFactor, ConstrainedSolver
+
+
+# Long-only minimum-variance and target-return QPs: active-set solver vs
+# scipy's SLSQP on random covariance matrices of increasing size.
+#   python benchmarks/bench_qp.py --sizes 50 100 200 500
+# Min-variance is one or two active-set steps and wins by 20x-1000x across
+# the range. Target-return from a cold start needs roughly one step per
+# asset (35 at n=50, ~450 at n=500), and at small n each step is dominated
+# by NumPy/LAPACK call overhead (~150 us), not arithmetic: it is only ~3-5x
+# faster than SLSQP at n=50, ~10x at n=100 and 30x-100x from n=200 up. The
+# order-of-magnitude target is therefore met from about 100 assets; below
+# that, warm starts (frontier sweeps, rolling windows) are what make it cheap.
+
+
+def random_problem(n, seed=0):
+    rng = np.random.default_rng(seed)
+    k = max(3, n // 10)
+    B = rng.normal(scale=0.01, size=(n, k))
+    Sigma = B @ B.T + np.diag(rng.uniform(1e-5, 4e-4, n))
+    mu = rng.normal(4e-4, 3e-4, n)
+    return Sigma, mu
+
+
+def best_of(run, repeat):
+    # Fastest of `repeat` runs, keeping that run's (weights, iterations).
+    best = None
+    for _ in range(repeat):
+        result = run()
+        if best is None or result[2] < best[2]:
+            best = result
+    return best
+
+
+def slsqp(Sigma, mu=None, target=None):
+    n = len(Sigma)
+    constraints = [{"type": "eq", "fun": lambda w: w.sum() - 1, "jac": lambda w: np.ones(n)}]
+    if target is not None:
+        constraints.append({"type": "eq", "fun": lambda w: (mu @ w - target) * 1e4, "jac": lambda w: mu * 1e4})
+    t0 = time.perf_counter()
+    result = minimize(
+        lambda w: w @ Sigma @ w * 1e4,
+        np.full(n, 1.0 / n),
+        jac=lambda w: 2e4 * Sigma @ w,
+        method="SLSQP",
+        bounds=[(0.0, 1.0)] * n,
+        constraints=constraints,
+        options={"ftol": 1e-12, "maxiter": 1000},
+    )
+    return result.x, result.nit, time.perf_counter() - t0
+
+
+def active_set(Sigma, mu, target=None):
+    t0 = time.perf_counter()
+    solver = ConstrainedSolver(Sigma, mu)
+    x = CovarianceFactor(Sigma).solve(np.ones(len(mu)))
+    w = solver.min_variance(w0=x / x.sum())
+    iterations = solver.iterations
+    if target is not None:
+        w = solver.target_return(target)
+        iterations += solver.iterations
+    return w, iterations, time.perf_counter() - t0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Active-set QP vs SLSQP benchmark")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[50, 100, 200, 500])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'n':>5} {'problem':>14} {'active-set it':>14} {'time (ms)':>10} {'SLSQP it':>9} {'time (ms)':>10} {'speedup':>8} {'rel. objective gap':>19}")
+    for n in args.sizes:
+        Sigma, mu = random_problem(n)
+        w_min = ConstrainedSolver(Sigma, mu).min_variance()
+        target = 0.5 * (mu @ w_min + mu.max())
+        for name, tgt in (("min variance", None), ("target return", target)):
+            w_a, it_a, t_a = best_of(lambda: active_set(Sigma, mu, tgt), args.repeat)
+            w_s, it_s, t_s = best_of(lambda: slsqp(Sigma, mu, tgt), 1 if n > 200 else args.repeat)
+            gap = (w_s @ Sigma @ w_s - w_a @ Sigma @ w_a) / (w_a @ Sigma @ w_a)
+            print(f"{n:>5} {name:>14} {it_a:>14} {t_a * 1000:>10.2f} {it_s:>9} {t_s * 1000:>10.2f} {t_s / t_a:>7.0f}x {gap:>19.2e}")
+
+
+if __name__ == "__main__":
+    main()
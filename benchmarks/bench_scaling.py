@@ -0,0 +1,210 @@
+import argparse
+import datetime
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+from portfolio_optimizer import PortfolioOptimizer
+
+
+# How the optimizer scales with the number of assets and the length of the
+# history, on synthetic daily price panels (factor-model returns, so the
+# covariance is well conditioned at every size).
+#   python benchmarks/bench_scaling.py                         two sweeps, saved as JSON
+#   python benchmarks/bench_scaling.py --assets 10 100 --years 1 5 --full
+#   python benchmarks/bench_scaling.py --compare old.json [--check]
+# The asset sweep runs at --fixed-years, the history sweep at --fixed-assets
+# (--full runs every combination instead). For each stage the wall time
+# (best of --repeat) and the tracemalloc peak of one extra run are recorded,
+# and a log-log fit gives the scaling exponent in n and in T.
+
+STAGES = ("construct", "min_risk", "target_return", "metrics", "allocation")
+
+TARGET_ANNUAL_RETURN = 7.0
+
+
+def synthetic_prices(n_assets, years, seed=0):
+    rng = np.random.default_rng(seed)
+    T = int(years * 252)
+    k = max(1, min(10, n_assets // 5))
+    loadings = rng.normal(1.0, 0.5, (n_assets, k)) / np.sqrt(k)
+    factors = rng.normal(0, 0.01, (T, k))
+    returns = factors @ loadings.T + rng.normal(0, 0.015, (T, n_assets)) + rng.normal(4e-4, 2e-4, n_assets)
+    index = pd.bdate_range("1990-01-01", periods=T + 1)
+    prices = 100 * np.exp(np.vstack([np.zeros(n_assets), np.cumsum(returns, axis=0)]))
+    return pd.DataFrame(prices, index=index, columns=[f"S{i:04d}" for i in range(n_assets)])
+
+
+def stage_runs(prices):
+    # (stage, run) pairs; each run does the full stage from a cold factorisation
+    state = {}
+    daily_target = (1 + TARGET_ANNUAL_RETURN / 100) ** (1 / 252) - 1
+
+    def construct():
+        state["optimizer"] = PortfolioOptimizer.from_prices(prices)
+
+    def cold():
+        optimizer = state["optimizer"]
+        optimizer.Sigma = optimizer.Sigma  # drops the cached factorisation
+        return optimizer
+
+    def allocation():
+        cold().allocation().to_frame()
+
+    return [
+        ("construct", construct),
+        ("min_risk", lambda: cold().singleEquationSolver()),
+        ("target_return", lambda: cold().markowitz_optimal_weights_specific_return(daily_target)),
+        ("metrics", lambda: cold().calculate_metrics()),
+        ("allocation", allocation),
+    ]
+
+
+def measure(run, repeat):
+    run()  # warm-up: lazy imports, first-touch allocations
+    best = np.inf
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        run()
+        best = min(best, time.perf_counter() - t0)
+    tracemalloc.start()
+    try:
+        run()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return best, peak
+
+
+def run_case(n_assets, years, repeat):
+    prices = synthetic_prices(n_assets, years)
+    rows = []
+    for name, run in stage_runs(prices):
+        seconds, peak = measure(run, repeat)
+        rows.append({
+            "stage": name, "assets": n_assets, "years": years, "bars": len(prices),
+            "seconds": seconds, "peak_bytes": peak,
+        })
+        print(f"{n_assets:>6} {years:>5} {name:>14} {seconds * 1000:>11.2f} {peak / 1024 ** 2:>10.1f}", flush=True)
+    return rows
+
+
+def scaling_exponents(results, sweep, fixed):
+    # Slope of log(time) and log(peak) against log(assets) or log(bars) per stage
+    frame = pd.DataFrame(results)
+    x_column, fixed_column = ("assets", "years") if sweep == "assets" else ("bars", "assets")
+    frame = frame[frame[fixed_column] == fixed]
+    exponents = {}
+    for name, group in frame.groupby("stage"):
+        if group[x_column].nunique() < 2:
+            continue
+        x = np.log(group[x_column].to_numpy(dtype=float))
+        exponents[name] = {
+            "time": float(np.polyfit(x, np.log(group["seconds"].to_numpy()), 1)[0]),
+            "memory": float(np.polyfit(x, np.log(np.maximum(group["peak_bytes"].to_numpy(dtype=float), 1)), 1)[0]),
+        }
+    return exponents
+
+
+def environment():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True).stdout.strip()
+    except OSError:
+        commit = None
+    return {
+        "commit": commit or None,
+        "date": datetime.datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "pandas": pd.__version__,
+        "machine": platform.machine(),
+        "cpus": os.cpu_count(),
+    }
+
+
+def compare(current, baseline_path, tolerance, min_time=1e-3):
+    # Prints time/memory ratios against a saved run; returns the regressions.
+    # Cases faster than min_time in the baseline are shown but not flagged
+    # for time (timer noise dominates there).
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    key = ["stage", "assets", "years"]
+    merged = pd.DataFrame(current["results"]).merge(pd.DataFrame(baseline["results"]), on=key, suffixes=("", "_base"))
+    if merged.empty:
+        print("No cases in common with the baseline.")
+        return []
+    merged["time_ratio"] = merged["seconds"] / merged["seconds_base"]
+    merged["memory_ratio"] = merged["peak_bytes"] / merged["peak_bytes_base"].clip(lower=1)
+    print(f"\nCompared with {baseline_path} (commit {baseline['environment'].get('commit')}):")
+    print(f"{'assets':>6} {'years':>5} {'stage':>14} {'time x':>8} {'memory x':>9}")
+    regressions = []
+    for row in merged.itertuples():
+        flag = ""
+        slower = row.time_ratio > tolerance and row.seconds_base >= min_time
+        if slower or row.memory_ratio > tolerance:
+            flag = "  REGRESSION"
+            regressions.append((row.stage, row.assets, row.years))
+        print(f"{row.assets:>6} {row.years:>5} {row.stage:>14} {row.time_ratio:>8.2f} {row.memory_ratio:>9.2f}{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Optimizer scaling benchmark over asset count and history length")
+    parser.add_argument("--assets", type=int, nargs="+", default=[10, 50, 200, 500, 1000, 2000])
+    parser.add_argument("--years", type=float, nargs="+", default=[1, 5, 10, 30])
+    parser.add_argument("--fixed-years", type=float, default=10, help="history length for the asset sweep")
+    parser.add_argument("--fixed-assets", type=int, default=100, help="asset count for the history sweep")
+    parser.add_argument("--full", action="store_true", help="run every (assets, years) combination")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--output", default=None, help="JSON file (default benchmarks/results/scaling-<commit>.json)")
+    parser.add_argument("--compare", default=None, help="earlier JSON result to compare against")
+    parser.add_argument("--tolerance", type=float, default=1.25, help="ratio above which a case counts as a regression")
+    parser.add_argument("--min-time", type=float, default=1e-3, help="baseline seconds below which time ratios are not flagged")
+    parser.add_argument("--check", action="store_true", help="exit with status 1 on any regression")
+    args = parser.parse_args()
+
+    if args.full:
+        cases = [(n, y) for n in args.assets for y in args.years]
+    else:
+        cases = [(n, args.fixed_years) for n in args.assets]
+        cases += [(args.fixed_assets, y) for y in args.years if (args.fixed_assets, y) not in cases]
+    cases = [(n, y) for n, y in cases if n >= 2 and y > 0]
+
+    print(f"{'assets':>6} {'years':>5} {'stage':>14} {'time (ms)':>11} {'peak (MB)':>10}")
+    results = []
+    for n_assets, years in cases:
+        results.extend(run_case(n_assets, years, args.repeat))
+
+    exponents = {
+        "assets": scaling_exponents(results, "assets", args.fixed_years),
+        "bars": scaling_exponents(results, "bars", args.fixed_assets),
+    }
+    print("\nScaling exponents (time ~ size^k, log-log fit):")
+    for name in STAGES:
+        parts = [f"{sweep} {exponents[sweep][name]['time']:.2f} (memory {exponents[sweep][name]['memory']:.2f})"
+                 for sweep in ("assets", "bars") if name in exponents[sweep]]
+        print(f"  {name:<14} {', '.join(parts)}")
+
+    report = {"environment": environment(), "results": results, "exponents": exponents}
+    output = args.output or os.path.join(ROOT, "benchmarks", "results", f"scaling-{report['environment']['commit'] or 'local'}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nSaved {output}")
+
+    if args.compare:
+        regressions = compare(report, args.compare, args.tolerance, args.min_time)
+        if args.check and regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
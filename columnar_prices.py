@@ -0,0 +1,178 @@
+import json
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import numpy as np
+import pandas as pd
+
+
+# Binary columnar price store used instead of parsing stock_data.xlsx on every
+# request. A store is a directory holding one or more versions and a CURRENT
+# file naming the live one; each version is a directory holding:
+#   tickers.json  - column order
+#   dates.npy     - datetime64[ns] trading dates, sorted
+#   prices.npy    - float64 array of shape (n_tickers, n_dates), one row per
+#                   ticker so a single ticker's history is contiguous on disk
+# Both .npy files are opened with mmap_mode="r": only the pages for the
+# requested tickers/dates are touched, and the OS page cache shares them
+# across every Streamlit session (and process) reading the same store.
+# A conversion writes a new version and swaps CURRENT in one os.replace, so
+# concurrent converters never share files and readers see either the old
+# store or the new one, never a mix.
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def store_path(excel_file):
+    return os.path.splitext(excel_file)[0] + ".npystore"
+
+
+def _current_version(store_dir):
+    with open(os.path.join(store_dir, "CURRENT")) as f:
+        return f.read().strip()
+
+
+def convert_frame(prices, store_dir, keep_seconds=60):
+    prices = prices.sort_index()
+    os.makedirs(store_dir, exist_ok=True)
+    dates = np.asarray(pd.DatetimeIndex(prices.index).values, dtype="datetime64[ns]")
+    values = np.ascontiguousarray(prices.to_numpy(dtype=np.float64).T)
+    version_dir = tempfile.mkdtemp(dir=store_dir, prefix="v-")
+    version = os.path.basename(version_dir)
+    np.save(os.path.join(version_dir, "dates.npy"), dates)
+    np.save(os.path.join(version_dir, "prices.npy"), values)
+    with open(os.path.join(version_dir, "tickers.json"), "w") as f:
+        json.dump([str(c) for c in prices.columns], f)
+    fd, pointer = tempfile.mkstemp(dir=store_dir, prefix="CURRENT.", suffix=".tmp")
+    with os.fdopen(fd, "w") as f:
+        f.write(version)
+    os.replace(pointer, os.path.join(store_dir, "CURRENT"))
+    # Drop superseded versions (and leftovers of crashed conversions) once
+    # they are old enough that no conversion or reader is still on them
+    current = _current_version(store_dir)
+    cutoff = time.time() - keep_seconds
+    for name in os.listdir(store_dir):
+        path = os.path.join(store_dir, name)
+        if name.startswith(("v-", "CURRENT.")) and name not in (version, current):
+            try:
+                if os.path.getmtime(path) < cutoff:
+                    shutil.rmtree(path) if os.path.isdir(path) else os.remove(path)
+            except OSError:
+                pass
+    return store_dir
+
+
+def convert_excel(excel_file, store_dir=None):
+    prices = pd.read_excel(excel_file, index_col=0, parse_dates=True)
+    return convert_frame(prices, store_dir or store_path(excel_file))
+
+
+def _open_store(store_dir):
+    key = os.path.abspath(store_dir)
+    for attempt in range(3):
+        version = _current_version(key)
+        with _stores_lock:
+            store = _stores.get(key)
+            if store is not None and store["version"] == version:
+                return store
+            path = os.path.join(key, version)
+            try:
+                with open(os.path.join(path, "tickers.json")) as f:
+                    tickers = json.load(f)
+                store = {
+                    "version": version,
+                    "tickers": tickers,
+                    "rows": {t: i for i, t in enumerate(tickers)},
+                    "dates": np.load(os.path.join(path, "dates.npy"), mmap_mode="r"),
+                    "prices": np.load(os.path.join(path, "prices.npy"), mmap_mode="r"),
+                }
+            except FileNotFoundError:
+                # Superseded and cleaned up after CURRENT was read: re-read it
+                if attempt == 2:
+                    raise
+                continue
+            _stores[key] = store
+            return store
+
+
+def available_tickers(store_dir):
+    return list(_open_store(store_dir)["tickers"])
+
+
+def date_range(store_dir):
+    dates = _open_store(store_dir)["dates"]
+    if len(dates) == 0:
+        return None, None
+    return pd.Timestamp(dates[0]), pd.Timestamp(dates[-1])
+
+
+def load_prices(store_dir, tickers=None, start=None, end=None):
+    # Same [start, end) convention as download_data; unknown tickers are skipped.
+    store = _open_store(store_dir)
+    dates = store["dates"]
+    lo = 0 if start is None else int(np.searchsorted(dates, np.datetime64(pd.Timestamp(start), "ns"), "left"))
+    hi = len(dates) if end is None else int(np.searchsorted(dates, np.datetime64(pd.Timestamp(end), "ns"), "left"))
+    if tickers is None:
+        tickers = store["tickers"]
+    tickers = [t for t in tickers if t in store["rows"]]
+    rows = [store["rows"][t] for t in tickers]
+    values = np.array(store["prices"][rows, lo:hi]).T
+    index = pd.DatetimeIndex(np.array(dates[lo:hi]))
+    return pd.DataFrame(values, index=index, columns=tickers)
+
+
+def _store_is_fresh(excel_file, store_dir):
+    pointer = os.path.join(store_dir, "CURRENT")
+    if not os.path.exists(pointer):
+        return False
+    if not os.path.exists(excel_file):
+        return True
+    return os.path.getmtime(pointer) >= os.path.getmtime(excel_file)
+
+
+def ensure_store(excel_file):
+    # Store directory for the workbook, converted once (and again whenever the
+    # workbook changes).
+    store_dir = store_path(excel_file)
+    if not _store_is_fresh(excel_file, store_dir):
+        if not os.path.exists(excel_file):
+            raise FileNotFoundError(excel_file)
+        convert_excel(excel_file, store_dir)
+    return store_dir
+
+
+def load_excel_fallback(excel_file, tickers=None, start=None, end=None):
+    return load_prices(ensure_store(excel_file), tickers, start, end)
+
+
+def compare_load_times(excel_file, tickers=None, start=None, end=None, repeat=3):
+    store_dir = ensure_store(excel_file)
+
+    def best_of(load):
+        timings = []
+        for _ in range(repeat):
+            t0 = time.perf_counter()
+            load()
+            timings.append(time.perf_counter() - t0)
+        return min(timings)
+
+    excel_s = best_of(lambda: pd.read_excel(excel_file, index_col=0, parse_dates=True))
+    columnar_s = best_of(lambda: load_prices(store_dir, tickers, start, end))
+    return {
+        "excel_s": excel_s,
+        "columnar_s": columnar_s,
+        "speedup": excel_s / columnar_s if columnar_s else float("inf"),
+    }
+
+
+if __name__ == "__main__":
+    excel_file = sys.argv[1] if len(sys.argv) > 1 else "stock_data.xlsx"
+    print(f"Converted {excel_file} -> {convert_excel(excel_file)}")
+    timings = compare_load_times(excel_file)
+    print(f"Excel (openpyxl): {timings['excel_s'] * 1000:.2f} ms")
+    print(f"Columnar (mmap):  {timings['columnar_s'] * 1000:.2f} ms")
+    print(f"Speedup:          {timings['speedup']:.0f}x")
@@ -0,0 +1,165 @@
+import numpy as np
+
+from rolling_stats import RunningMoments
+
+
+# Covariance estimators for PortfolioOptimizer. Each takes a (bars x assets)
+# array of returns and returns either a dense ndarray or, for the factor
+# model, a LowRankFactor that never forms the n x n matrix.
+#   sample        DataFrame.cov() equivalent (ddof=1)
+#   ledoit_wolf   sample covariance shrunk towards a scaled identity
+#   ewma          exponentially weighted, `halflife` bars
+#   factor        k principal factors plus a diagonal of residual variances
+
+ESTIMATORS = ("sample", "ledoit_wolf", "ewma", "factor")
+
+# Working memory for one block of rows in the chunked estimators
+CHUNK_BYTES = 64 * 1024 ** 2
+
+
+def sample_covariance(returns):
+    returns = np.asarray(returns, dtype=float)
+    centered = returns - returns.mean(axis=0)
+    return centered.T @ centered / (len(returns) - 1)
+
+
+def _chunks(n_rows, n_cols, memory_budget):
+    step = max(1, int(memory_budget // (2 * 8 * max(n_cols, 1))))
+    return ((lo, min(lo + step, n_rows)) for lo in range(0, n_rows, step))
+
+
+def chunked_mean(returns, memory_budget=CHUNK_BYTES):
+    # Column means of a large (possibly float32 or memory-mapped) array,
+    # summed in float64 one block of rows at a time.
+    values = returns if isinstance(returns, np.ndarray) else np.asarray(returns)
+    total = np.zeros(values.shape[1])
+    for lo, hi in _chunks(*values.shape, memory_budget):
+        total += values[lo:hi].sum(axis=0, dtype=np.float64)
+    return total / len(values)
+
+
+def chunked_covariance(returns, mean=None, memory_budget=CHUNK_BYTES):
+    # Sample covariance (ddof=1) accumulated in float64 over blocks of rows:
+    # only one centered float64 block exists at a time besides the n x n result.
+    values = returns if isinstance(returns, np.ndarray) else np.asarray(returns)
+    mean = chunked_mean(values, memory_budget) if mean is None else np.asarray(mean, dtype=float)
+    comoment = np.zeros((values.shape[1], values.shape[1]))
+    for lo, hi in _chunks(*values.shape, memory_budget):
+        block = values[lo:hi].astype(np.float64) - mean
+        comoment += block.T @ block
+    return comoment / (len(values) - 1)
+
+
+def ledoit_wolf_shrinkage(returns):
+    # Optimal intensity for shrinking towards mu * I (Ledoit & Wolf, 2004)
+    returns = np.asarray(returns, dtype=float)
+    T, n = returns.shape
+    X = returns - returns.mean(axis=0)
+    S = X.T @ X / T
+    mu = np.trace(S) / n
+    delta = (np.sum(S ** 2) - 2 * mu * np.trace(S) + n * mu ** 2) / n
+    X2 = X ** 2
+    beta = (np.sum(X2.T @ X2) / T - np.sum(S ** 2)) / (n * T)
+    if delta <= 0:
+        return 0.0
+    return float(min(beta, delta) / delta)
+
+
+def ledoit_wolf(returns, shrinkage=None):
+    sample = sample_covariance(returns)
+    if shrinkage is None:
+        shrinkage = ledoit_wolf_shrinkage(returns)
+    mu = np.trace(sample) / len(sample)
+    shrunk = (1 - shrinkage) * sample
+    shrunk[np.diag_indices_from(shrunk)] += shrinkage * mu
+    return shrunk
+
+
+def ewma_covariance(returns, halflife=63):
+    return RunningMoments.from_returns(returns, halflife=halflife).cov
+
+
+def _top_factors(X, k, oversample=10, power_iterations=2, seed=0):
+    # Leading k right singular vectors and values of X by a randomized range
+    # finder: O(T * n * k) instead of a full SVD.
+    T, n = X.shape
+    size = min(k + oversample, n, T)
+    Q = np.linalg.qr(X @ np.random.default_rng(seed).standard_normal((n, size)))[0]
+    for _ in range(power_iterations):
+        Q = np.linalg.qr(X @ (X.T @ Q))[0]
+    _, s, Vt = np.linalg.svd(Q.T @ X, full_matrices=False)
+    return s[:k], Vt[:k].T
+
+
+def factor_model(returns, factors=5, floor=1e-4):
+    # Sigma ~ B B' + diag(d): B holds the k principal components scaled by
+    # their standard deviation, d the remaining variance of each asset
+    # (floored at `floor` times the average variance to stay positive).
+    returns = np.asarray(returns, dtype=float)
+    X = returns - returns.mean(axis=0)
+    k = min(factors, *X.shape)
+    s, V = _top_factors(X, k)
+    B = V * (s / np.sqrt(len(X) - 1))
+    variances = np.einsum("ij,ij->j", X, X) / (len(X) - 1)
+    d = np.maximum(variances - np.einsum("ij,ij->i", B, B), floor * variances.mean())
+    return LowRankFactor(B, d)
+
+
+def estimate(returns, estimator="sample", **options):
+    if estimator == "sample":
+        return sample_covariance(returns)
+    if estimator == "ledoit_wolf":
+        return ledoit_wolf(returns, **options)
+    if estimator == "ewma":
+        return ewma_covariance(returns, **options)
+    if estimator == "factor":
+        return factor_model(returns, **options)
+    raise ValueError(f"Unknown covariance estimator '{estimator}'. Use one of {list(ESTIMATORS)}.")
+
+
+# Sigma = B B' + diag(d) kept in O(n k) memory. Solves use the Woodbury
+# identity
+#     Sigma^-1 = D^-1 - D^-1 B (I + B' D^-1 B)^-1 B' D^-1
+# so each costs O(n k) after an O(n k^2) setup; same solve() interface as
+# CovarianceFactor.
+class LowRankFactor:
+    method = "woodbury"
+
+    def __init__(self, B, d):
+        self.B = np.asarray(B, dtype=float)
+        self.d = np.asarray(d, dtype=float)
+        self.n, self.k = self.B.shape
+        self._DinvB = self.B / self.d[:, None]
+        self._capacitance = np.linalg.cholesky(np.eye(self.k) + self.B.T @ self._DinvB)
+
+    @property
+    def nbytes(self):
+        return self.B.nbytes + self.d.nbytes + self._DinvB.nbytes + self._capacitance.nbytes
+
+    def _capacitance_solve(self, b):
+        y = np.linalg.solve(self._capacitance, b)
+        return np.linalg.solve(self._capacitance.T, y)
+
+    def solve(self, b):
+        # Sigma^-1 b for a vector or an (n x m) block of right-hand sides
+        b = np.asarray(b, dtype=float)
+        d = self.d if b.ndim == 1 else self.d[:, None]
+        return b / d - self._DinvB @ self._capacitance_solve(self._DinvB.T @ b)
+
+    def matvec(self, w):
+        w = np.asarray(w, dtype=float)
+        d = self.d if w.ndim == 1 else self.d[:, None]
+        return d * w + self.B @ (self.B.T @ w)
+
+    def quadratic(self, w):
+        # w' Sigma w
+        w = np.asarray(w, dtype=float)
+        return float(self.d @ w ** 2 + np.sum((self.B.T @ w) ** 2))
+
+    def diagonal(self):
+        return self.d + np.einsum("ij,ij->i", self.B, self.B)
+
+    def to_dense(self):
+        Sigma = self.B @ self.B.T
+        Sigma[np.diag_indices_from(Sigma)] += self.d
+        return Sigma
@@ -0,0 +1,137 @@
+import contextvars
+import functools
+import json
+import time
+from contextlib import contextmanager, nullcontext
+
+
+# Per-request timing of the optimization pipeline. Library code marks its
+# stages with
+#     with stage("covariance"): ...      or   @timed("covariance")
+#     count("qp_iterations", n)
+# which cost one context-variable lookup when nothing is being traced. A
+# caller that wants the numbers wraps the request in
+#     with trace("calculate") as t: ...
+# and reads t.timers / t.counters, or t.to_json() for offline analysis.
+# The active trace is per thread / asyncio task, so concurrent Streamlit
+# sessions keep separate traces; work handed to pool threads is not traced.
+
+_current = contextvars.ContextVar("trace", default=None)
+_NULL = nullcontext()
+
+
+class Trace:
+    def __init__(self, name):
+        self.name = name
+        self.started_at = time.time()
+        self.timers = {}    # stage -> [calls, total seconds]
+        self.counters = {}
+        self.spans = []     # (stage, depth, start offset, seconds) in finish order
+        self.duration = None
+        self._origin = time.perf_counter()
+        self._depth = 0
+
+    def _record(self, name, depth, start, elapsed):
+        timer = self.timers.get(name)
+        if timer is None:
+            self.timers[name] = [1, elapsed]
+        else:
+            timer[0] += 1
+            timer[1] += elapsed
+        self.spans.append((name, depth, start - self._origin, elapsed))
+
+    def count(self, name, n=1):
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def rows(self):
+        # One row per stage, slowest first
+        return sorted(
+            ({"stage": name, "calls": calls, "total_ms": total * 1e3, "mean_ms": total * 1e3 / calls}
+             for name, (calls, total) in self.timers.items()),
+            key=lambda row: -row["total_ms"],
+        )
+
+    def to_dict(self):
+        return {
+            "name": self.name,
+            "started_at": self.started_at,
+            "duration_ms": None if self.duration is None else self.duration * 1e3,
+            "stages": self.rows(),
+            "counters": dict(self.counters),
+            "spans": [
+                {"stage": name, "depth": depth, "start_ms": start * 1e3, "duration_ms": elapsed * 1e3}
+                for name, depth, start, elapsed in self.spans
+            ],
+        }
+
+    def to_json(self, path=None, indent=2):
+        text = json.dumps(self.to_dict(), indent=indent)
+        if path is not None:
+            with open(path, "w") as f:
+                f.write(text)
+        return text
+
+
+class _Stage:
+    __slots__ = ("trace", "name", "depth", "start")
+
+    def __init__(self, trace, name):
+        self.trace = trace
+        self.name = name
+
+    def __enter__(self):
+        self.depth = self.trace._depth
+        self.trace._depth += 1
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        elapsed = time.perf_counter() - self.start
+        self.trace._depth -= 1
+        self.trace._record(self.name, self.depth, self.start, elapsed)
+        return False
+
+
+def stage(name):
+    trace = _current.get()
+    return _NULL if trace is None else _Stage(trace, name)
+
+
+def timed(name):
+    # Decorator form of stage() for functions that are one stage end to end
+    def decorate(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            trace = _current.get()
+            if trace is None:
+                return func(*args, **kwargs)
+            with _Stage(trace, name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def count(name, n=1):
+    trace = _current.get()
+    if trace is not None:
+        trace.count(name, n)
+
+
+def current_trace():
+    return _current.get()
+
+
+@contextmanager
+def trace(name="request", enabled=True):
+    # enabled=False runs the block untraced (yields None), so callers can
+    # keep one code path for a debug toggle.
+    if not enabled:
+        yield None
+        return
+    active = Trace(name)
+    token = _current.set(active)
+    try:
+        yield active
+    finally:
+        active.duration = time.perf_counter() - active._origin
+        _current.reset(token)
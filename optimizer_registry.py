@@ -0,0 +1,230 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import pandas as pd
+
+from columnar_prices import date_range, load_prices as load_store_prices
+from instrumentation import stage
+from portfolio_optimizer import PortfolioOptimizer, load_prices
+
+
+# Thread-safe LRU cache with a TTL and a memory bound. Concurrent callers asking
+# for the same missing key wait for a single build instead of each running
+# the factory themselves. Values may grow after insertion (optimizers build
+# factorisations and dense views lazily), so an entry is re-measured each
+# time it is handed out again.
+class SharedCache:
+    def __init__(self, max_entries=32, max_bytes=512 * 1024 ** 2, ttl=3600, sizeof=None, clock=time.monotonic):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.sizeof = sizeof or (lambda value: 0)
+        self.clock = clock
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.nbytes = 0
+        self._entries = OrderedDict()
+        self._building = {}
+        self._lock = threading.Lock()
+
+    def _expired(self, entry):
+        return self.ttl is not None and self.clock() - entry[1] > self.ttl
+
+    def _drop(self, key):
+        _, _, size = self._entries.pop(key)
+        self.nbytes -= size
+
+    def _hit(self, key):
+        # Under the lock: move to the MRU end and refresh the recorded size
+        value, created, size = self._entries[key]
+        self._entries.move_to_end(key)
+        current = self.sizeof(value)
+        if current != size:
+            self._entries[key] = (value, created, current)
+            self.nbytes += current - size
+            self._evict()
+        return value
+
+    def _evict(self):
+        # The newest entry always survives, even if it alone exceeds max_bytes.
+        while len(self._entries) > 1 and (len(self._entries) > self.max_entries or self.nbytes > self.max_bytes):
+            self._drop(next(iter(self._entries)))
+            self.evictions += 1
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or self._expired(entry):
+                self.misses += 1
+                return default
+            self.hits += 1
+            return self._hit(key)
+
+    def put(self, key, value):
+        size = self.sizeof(value)
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = (value, self.clock(), size)
+            self.nbytes += size
+            self._evict()
+
+    def get_or_create(self, key, factory):
+        while True:
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry is not None:
+                    if not self._expired(entry):
+                        self.hits += 1
+                        return self._hit(key)
+                    self._drop(key)
+                building = self._building.get(key)
+                if building is None:
+                    building = self._building[key] = threading.Event()
+                    owner = True
+                else:
+                    owner = False
+            if owner:
+                break
+            # Another thread is building this key: wait, then re-check. If that
+            # build failed, this caller becomes the next owner.
+            building.wait()
+
+        try:
+            value = factory()
+        except BaseException:
+            with self._lock:
+                del self._building[key]
+            building.set()
+            raise
+        size = self.sizeof(value)
+        with self._lock:
+            self.misses += 1
+            self._entries[key] = (value, self.clock(), size)
+            self.nbytes += size
+            self._evict()
+            del self._building[key]
+        building.set()
+        return value
+
+    def find(self, predicate):
+        # Most recently used live value for which predicate(key, value) holds
+        with self._lock:
+            for key in reversed(self._entries):
+                entry = self._entries[key]
+                if not self._expired(entry) and predicate(key, entry[0]):
+                    self.hits += 1
+                    return self._hit(key)
+        return None
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self.nbytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.nbytes = 0
+
+
+def optimizer_nbytes(optimizer):
+    # Everything the optimizer holds that grows with the universe: data,
+    # covariance (the low-rank model plus its dense view once something has
+    # built it), the cached factorisation and the solvers' KKT factors
+    nbytes = (
+        optimizer.returns.memory_usage(index=True).sum()
+        + optimizer.pBar.memory_usage(index=True)
+    )
+    if optimizer.prices is not None:
+        nbytes += optimizer.prices.memory_usage(index=True).sum()
+    if optimizer.covariance_model is not None:
+        nbytes += optimizer.covariance_model.nbytes
+    if optimizer._Sigma is not None:
+        nbytes += optimizer._Sigma.memory_usage(index=True).sum()
+    factor = optimizer._factor
+    if factor is not None and factor is not optimizer.covariance_model:
+        nbytes += factor.nbytes
+    # Snapshot: sessions may add solvers meanwhile; each solver's size is
+    # measured by the solver itself between calls
+    for solver in tuple(optimizer._solvers.values()):
+        nbytes += solver.nbytes
+    return int(nbytes)
+
+
+# One registry per process: every Streamlit session (a thread in the same
+# server process) reuses the same returns/covariance for a given universe.
+registry = SharedCache(max_entries=16, max_bytes=256 * 1024 ** 2, ttl=6 * 3600, sizeof=optimizer_nbytes)
+
+
+def _store_covers(store_dir, start, end, slack=3):
+    # True when the store's dates reach both ends of [start, end); up to
+    # `slack` weekdays may be missing at either end (exchange holidays)
+    first, last = date_range(store_dir)
+    if first is None:
+        return False
+    start, end = pd.Timestamp(start), pd.Timestamp(end)
+    day = pd.Timedelta(days=1)
+    return (len(pd.bdate_range(start, min(first, end) - day)) <= slack
+            and len(pd.bdate_range(max(last, start) + day, end - day)) <= slack)
+
+
+def universe_prices(stocks, start, end, store_dir=None, excel_file="stock_data.xlsx"):
+    # Prices for a selection, [start, end): read from the local columnar
+    # store when it has every ticker over the whole window, otherwise through
+    # load_prices (local price cache, then the network, then the workbook).
+    # A window the store only partly covers is loaded from one source so the
+    # adjusted closes stay on a single basis; tickers the store lacks within
+    # a covered window are fetched on their own and joined on its dates.
+    stocks = list(stocks)
+    if store_dir is None or not _store_covers(store_dir, start, end):
+        return load_prices(stocks, start, end, excel_file)
+    with stage("store_load"):
+        prices = load_store_prices(store_dir, stocks, start, end)
+    missing = [t for t in stocks if t not in prices.columns]
+    if missing:
+        fetched = load_prices(missing, start, end, excel_file)
+        if fetched is not None:
+            prices = prices.join(fetched.reindex(columns=[t for t in missing if t in fetched.columns]), how="left")
+    return prices
+
+
+def get_universe_optimizer(stocks, start, end, store_dir=None, riskFreeRate=0.044, frequency="daily", cache=None,
+                           excel_file="stock_data.xlsx", drop_missing=False):
+    # Optimizer for any selection of tickers; prices come from
+    # universe_prices() (the local store first). The returned optimizer is
+    # shared between sessions and must be treated as read-only. When an
+    # optimizer over a superset of the selection and the same window is
+    # already cached, the selection is sliced out of it (subset()) instead.
+    # With drop_missing, tickers without any price data are left out (the
+    # optimizer's .stocks says which remain) as long as two are left;
+    # otherwise they fail the whole request.
+    cache = registry if cache is None else cache
+    stocks = tuple(sorted(set(stocks)))
+    source = os.path.abspath(store_dir) if store_dir is not None else None
+    window = ("universe", source, excel_file, str(start), str(end), frequency, riskFreeRate, drop_missing)
+
+    def build():
+        wanted = set(stocks)
+        superset = cache.find(lambda key, value: key[:-1] == window and wanted <= set(value.stocks))
+        if superset is not None:
+            with stage("subset"):
+                return superset.subset(stocks)
+        prices = universe_prices(stocks, start, end, store_dir, excel_file)
+        prices = prices.dropna(axis=1, how="all") if prices is not None else None
+        found = [t for t in stocks if prices is not None and t in prices.columns]
+        if len(found) < (2 if drop_missing else len(stocks)) or not found:
+            missing = sorted(wanted - set(found))
+            raise ValueError(f"No price data for {', '.join(missing) or 'the selected window'}.")
+        return PortfolioOptimizer.from_prices(prices[found], riskFreeRate=riskFreeRate, frequency=frequency)
+
+    with stage("get_optimizer"):
+        return cache.get_or_create(window + (stocks,), build)
@@ -1,5 +1,4 @@
 import streamlit as st
-import time
 
 
 # --- Website Created by Omar & Khaled ---
@@ -116,10 +115,6 @@ This project is a graduation project that combines academic knowledge in finance
 """)
 
 
-# Effect when switching between pages
-with st.spinner('Loading...'):
-    time.sleep(1)  # Wait before switching
-
 col1, col2, col3 = st.columns([3, 6, 3])
 
 # Back to Welcome Page
@@ -1,20 +1,275 @@
-
 import streamlit as st
 import plotly.express as px
 import pandas as pd
-import streamlit_shadcn_ui as ui
-import matplotlib.pyplot as plt
-
 import numpy as np
-import pandas as pd
-import yfinance as yf
-from scipy.optimize import minimize
 
-import time 
-import warnings
+import datetime
+
+from columnar_prices import available_tickers, ensure_store
+from instrumentation import trace
+from optimizer_registry import get_universe_optimizer
+from portfolio_optimizer import annual_to_daily_return
+
+DEFAULT_TICKERS = ['AAPL', 'JNJ', 'PG', 'JPM', 'XOM', 'AMZN', 'KO', 'MSFT', 'GOLD', 'CVX']
+DEFAULT_START, DEFAULT_END = datetime.date(2015, 1, 1), datetime.date(2023, 12, 30)
+EARLIEST_DATE = datetime.date(1990, 1, 1)
+
+
+def render_trace(request_trace):
+    # Debug panel: where the time of this run went (near zero when the
+    # results came from the cache)
+    with st.expander(f"⏱️ Timing trace ({request_trace.duration * 1000:.0f} ms)"):
+        if request_trace.timers:
+            st.dataframe(pd.DataFrame(request_trace.rows()).round(2), hide_index=True)
+        else:
+            st.caption("Nothing was recomputed: the results came from the cache.")
+        if request_trace.counters:
+            st.json(request_trace.counters)
+        st.download_button("Download trace (JSON)", request_trace.to_json(), file_name="trace.json", mime="application/json",
+                           on_click="ignore")
+
+
+def _bar_chart(x, y, title, y_label):
+    fig = px.bar(x=x, y=y, title=title, labels={"x": "Tickers", "y": y_label})
+    fig.update_layout(height=400, margin=dict(t=50, b=0, l=0, r=0))
+    return fig
+
+
+def parse_budgets(text):
+    try:
+        return tuple(float(b) for b in text.replace(";", ",").split(",") if b.strip())
+    except ValueError:
+        return ()
+
+
+@st.cache_data(max_entries=64, show_spinner=False)
+def compute_results(tickers, start, end, store, riskFreeRate, UserReturn, money, sweep_range, budgets):
+    # Everything the result tabs show (numbers, tables and figures) for one
+    # set of submitted inputs. Reruns with the same inputs (tab switches, the
+    # trace toggle, navigation) are served from here without solving again or
+    # rebuilding figures; the optimizer itself is shared across sessions.
+    optimizer = get_universe_optimizer(list(tickers), start, end, store, riskFreeRate, drop_missing=True)
+    # Tickers no source had prices for are left out with a warning
+    results = {"missing": sorted(set(tickers) - set(optimizer.stocks))}
+
+    # ---- Minimum Risk ----
+    w_opt_min = optimizer.singleEquationSolver()
+    allocations = optimizer.allocation()
+    # Bar chart straight from the raw weights (no 0.00% rows)
+    held = allocations.nonzero()
+    results["min_risk"] = {
+        "return": optimizer.portfolioReturn(w_opt_min),
+        "risk": optimizer.riskFunction(w_opt_min),
+        "table": allocations.to_frame(),
+        "figure": _bar_chart(allocations.tickers[held], allocations.percentages[held],
+                             "Asset Allocation (Minimum Risk)", "Allocation (%)"),
+    }
+
+    # ---- Target Return ----
+    # Strategies that need a positive expected return fail on their own tab
+    # only (e.g. every selected asset lost money over the window)
+    daily_target_return = annual_to_daily_return(UserReturn)
+    try:
+        w_opt_target = optimizer.markowitz_optimal_weights_specific_return(daily_target_return)
+    except ValueError as e:
+        results["target_return"] = {"error": str(e)}
+    else:
+        investment_required = np.sum(w_opt_target) * money
+        allocations_target = optimizer.allocation(
+            method=optimizer.markowitz_optimal_weights_specific_return,
+            U=daily_target_return,
+            money=investment_required
+        )
+        held_target = allocations_target.nonzero()
+        results["target_return"] = {
+            "return": optimizer.portfolioReturn(w_opt_target),
+            "risk": optimizer.riskFunction(w_opt_target),
+            "sum_weights": np.sum(w_opt_target),
+            "investment_required": investment_required,
+            "table": allocations_target.to_frame(),
+            "figure": _bar_chart(allocations_target.tickers[held_target], allocations_target.investments[held_target],
+                                 "Asset Allocation (Target Return) by Investment", "Investment ($)"),
+        }
+
+    # ---- Risk Parity ----
+    w_parity = optimizer.risk_parity()
+    contributions = optimizer.risk_contributions(w_parity)
+    results["risk_parity"] = {
+        "return": optimizer.portfolioReturn(w_parity),
+        "risk": optimizer.riskFunction(w_parity),
+        "table": optimizer.allocation(method=lambda: w_parity).to_frame(),
+        "contributions": contributions[["Marginal Risk", "Risk Contribution", "Risk Share (%)"]].round(4),
+        "figure": _bar_chart(contributions.index, contributions["Risk Share (%)"],
+                             "Share of Portfolio Volatility per Asset", "Risk Contribution (%)"),
+    }
+
+    # ---- Efficient Frontier ----
+    frontier = optimizer.efficient_frontier(num=300)
+    cloud = optimizer.random_portfolio_cloud(200_000, max_points=3000, seed=0)
+    cloud_df = pd.DataFrame({
+        "Volatility (%)": cloud["Volatility"] * 100,
+        "Expected Annual Return (%)": cloud["Return"] * 100,
+        "Sharpe Ratio": cloud["Sharpe"],
+    })
+    fig_frontier = px.scatter(
+        cloud_df,
+        x="Volatility (%)",
+        y="Expected Annual Return (%)",
+        color="Sharpe Ratio",
+        opacity=0.4,
+        title="Efficient Frontier vs Random Long-Only Portfolios",
+    )
+    fig_frontier.add_scatter(
+        x=frontier.volatilities * 100,
+        y=frontier.returns * 100,
+        mode="lines",
+        name="Efficient Frontier",
+        line=dict(color="#0072ff", width=3),
+    )
+    try:
+        cml = optimizer.capital_market_line(volatilities=[0, frontier.volatilities.max()])
+    except ValueError:
+        cml = None
+    if cml is not None:
+        fig_frontier.add_scatter(
+            x=cml.volatilities * 100,
+            y=cml.returns * 100,
+            mode="lines",
+            name="Capital Market Line",
+            line=dict(color="#ff7f0e", width=2, dash="dash"),
+        )
+        fig_frontier.add_scatter(
+            x=[cml.volatility * 100],
+            y=[cml.return_ * 100],
+            mode="markers",
+            name=f"Max Sharpe ({cml.sharpe:.2f})",
+            marker=dict(color="#ff7f0e", size=12, symbol="star"),
+        )
+    fig_frontier.update_layout(height=400, margin=dict(t=50, b=0, l=0, r=0))
+    results["frontier"] = fig_frontier
+
+    # ---- Scenario Sweep ----
+    results["sweep"] = None
+    if budgets:
+        annual_targets = np.arange(sweep_range[0], sweep_range[1] + 0.25, 0.5)
+        # One solve for the whole grid (weights are linear in the target)
+        try:
+            sweep = optimizer.scenario_sweep(annual_targets, budgets)
+        except ValueError as e:
+            results["sweep"] = {"error": str(e)}
+            return results
+        grid = pd.DataFrame(
+            sweep.investment_required,
+            index=[f"{t:.1f}%" for t in sweep.annual_targets],
+            columns=[f"${b:,.0f}" for b in sweep.budgets],
+        )
+        fig_sweep = px.imshow(
+            grid,
+            labels={"x": "Budget", "y": "Target Annual Return", "color": "Investment ($)"},
+            text_auto=".0f",
+            aspect="auto",
+            color_continuous_scale="Blues",
+        )
+        fig_sweep.update_layout(height=max(400, 22 * len(grid)), margin=dict(t=30, b=0, l=0, r=0))
+        summary = pd.DataFrame({
+            "Target Annual Return (%)": sweep.annual_targets,
+            "Expected Annual Return (%)": sweep.returns * 100,
+            "Portfolio Risk (%)": sweep.risks * 100,
+            "Sum of Weights": sweep.sum_weights,
+        })
+        results["sweep"] = {"figure": fig_sweep, "summary": summary.round(4)}
+    return results
+
+
+def render_target_return(target, UserReturn):
+    sub_tab3, sub_tab4 = st.tabs(["Summary", "Distribution"])
+    with sub_tab3:
+        st.markdown("#### Optimization Portfolio with Target Return")
+        st.markdown(f"**Expected Annual Return**: {target['return']:.2%}")
+        st.markdown(f"**Portfolio Risk**: {target['risk']:.4%}")
+        st.markdown(f"**Sum of Weights**: {target['sum_weights']:.4f}")
+        st.markdown(f"**To achieve your target return of {UserReturn:.2f}%, you need to invest:** ${target['investment_required']:.2f}")
+        st.caption("Note: The sum of weights exceeds 1 because the optimizer adjusts allocations to meet your return target.")
+
+    with sub_tab4:
+        st.table(target["table"])
+        st.plotly_chart(target["figure"], use_container_width=True)
+
+
+@st.fragment
+def render_results(results, UserReturn):
+    # Pure rendering of cached results; widgets in here rerun only this part
+    if results["missing"]:
+        st.warning(f"⚠️ No price data for {', '.join(results['missing'])} in this window: left out of every portfolio.")
+    with st.container(border=True):
+        main_tab1, main_tab2, main_tab3, main_tab4, main_tab5 = st.tabs(["Strategy: Minimum Risk", "Strategy: Target Return", "Strategy: Risk Parity", "Efficient Frontier", "Scenario Sweep"])
+
+        # ---- Minimum Risk ----
+        with main_tab1:
+            min_risk = results["min_risk"]
+            sub_tab1, sub_tab2 = st.tabs(["Summary", "Distribution"])
+            with sub_tab1:
+                st.markdown("#### Optimization Portfolio with Minimum Risk")
+                st.markdown(f"**Expected Annual Return**: {min_risk['return']:.2%}")
+                st.markdown(f"**Portfolio Risk**: {min_risk['risk']:.2%}")
+                st.caption("Note: This strategy does not require a target return. The portfolio is optimized to minimize risk, and the resulting return is a byproduct of this optimization.")
+
+            with sub_tab2:
+                st.table(min_risk["table"])
+                st.plotly_chart(min_risk["figure"], use_container_width=True)
+
+        # ---- Target Return ----
+        with main_tab2:
+            target = results["target_return"]
+            if "error" in target:
+                st.warning(f"⚠️ No target-return portfolio for this selection: {target['error']}")
+            else:
+                render_target_return(target, UserReturn)
+
+        # ---- Risk Parity ----
+        with main_tab3:
+            parity = results["risk_parity"]
+            sub_tab5, sub_tab6 = st.tabs(["Summary", "Distribution"])
+            with sub_tab5:
+                st.markdown("#### Risk Parity Portfolio")
+                st.markdown(f"**Expected Annual Return**: {parity['return']:.2%}")
+                st.markdown(f"**Portfolio Risk**: {parity['risk']:.2%}")
+                st.plotly_chart(parity["figure"], use_container_width=True)
+                st.caption("Note: Every asset contributes the same share of the portfolio's volatility. The portfolio is long-only and fully invested; no return forecast is used.")
+
+            with sub_tab6:
+                st.table(parity["table"])
+                st.dataframe(parity["contributions"], use_container_width=True)
+
+        # ---- Efficient Frontier ----
+        with main_tab4:
+            st.markdown("#### Efficient Frontier")
+            st.plotly_chart(results["frontier"], use_container_width=True)
+            st.caption("The line is the lowest-risk fully invested portfolio (weights sum to 1, short positions allowed) for each expected return. Dots are a sample of 200,000 random long-only portfolios. The dashed line mixes the risk-free rate with the max-Sharpe (tangency) portfolio.")
 
-from PIL import Image
-from portfolio_optimizer import PortfolioOptimizer
+        # ---- Scenario Sweep ----
+        with main_tab5:
+            st.markdown("#### Investment Required per Target Return and Budget")
+            if results["sweep"] is None:
+                st.warning("Enter at least one budget, e.g. 10000, 50000.")
+            elif "error" in results["sweep"]:
+                st.warning(f"⚠️ No scenario sweep for this selection: {results['sweep']['error']}")
+            else:
+                st.plotly_chart(results["sweep"]["figure"], use_container_width=True)
+                st.dataframe(results["sweep"]["summary"], hide_index=True, use_container_width=True)
+                st.caption("Each cell is the total you would need to invest to reach that target, scaled from your budget; risk grows with the square of the target.")
+
+
+@st.fragment
+def navigation():
+    # A fragment, so pressing a button does not rerun the results page
+    col1, col2, col3 = st.columns([3, 4, 2])
+    with col1:
+        if st.button("⬅️ Back to Welcome"):
+            st.switch_page("pages/wel.py")
+    with col3:
+        if st.button("➡️ Go to Performance"):
+            st.switch_page("pages/performance.py")
 
 
 def main():
@@ -35,6 +290,22 @@ def main():
     <div class="wave-text">📈 Smart Investing Starts Here</div>
     """, unsafe_allow_html=True)
 
+    show_trace = st.sidebar.toggle("Show timing trace", value=False)
+
+    # Universe: the default tickers plus every ticker in the local price
+    # store. The store (memory-mapped, only the selected columns and dates
+    # are read) serves what it has; other tickers and dates are downloaded.
+    # The pre-selection sticks to stored tickers so the default Calculate
+    # never needs the network.
+    try:
+        store = ensure_store("stock_data.xlsx")
+        stored = available_tickers(store)
+        universe = list(dict.fromkeys(DEFAULT_TICKERS + stored))
+        default_tickers = [t for t in DEFAULT_TICKERS if t in stored]
+    except FileNotFoundError:
+        st.warning("⚠️ Excel file 'stock_data.xlsx' not found: prices are downloaded only, with no offline backup.")
+        store, universe, default_tickers = None, DEFAULT_TICKERS, DEFAULT_TICKERS
+
     with st.container(border=True):
         st.markdown("### Input Parameters")
         with st.form("portfolio_form"):
@@ -57,121 +328,71 @@ def main():
                 help="Annual return you aim to achieve"
             )
 
+            tickers = st.multiselect(
+                "🏷️ Assets",
+                universe,
+                default=default_tickers,
+                help="Tickers missing from the local price store are downloaded"
+            )
+
+            col_start, col_end = st.columns(2)
+            with col_start:
+                start_date = st.date_input("📅 From", value=DEFAULT_START, min_value=EARLIEST_DATE, max_value=datetime.date.today())
+            with col_end:
+                end_date = st.date_input("📅 To", value=DEFAULT_END, min_value=EARLIEST_DATE, max_value=datetime.date.today())
+
+            with st.expander("🧮 Scenario sweep"):
+                sweep_range = st.slider(
+                    "Target annual returns (%)",
+                    min_value=0.5,
+                    max_value=30.0,
+                    value=(2.0, 15.0),
+                    step=0.5,
+                    help="Every target in this range, in steps of 0.5%"
+                )
+                sweep_budgets = st.text_input(
+                    "Budgets ($, comma separated)",
+                    value="5000, 10000, 25000, 50000, 100000"
+                )
+
             calculate = st.form_submit_button("🚀 Calculate")
 
+    if calculate and (len(tickers) < 2 or start_date >= end_date):
+        st.warning("Pick at least two assets and a start date before the end date.")
+        calculate = False
+
     if calculate:
-        with st.spinner("Buckle Up! Financial Wizardry in Progress...."):
-            try:
-                optimizer = PortfolioOptimizer(
-                    ['AAPL', 'JNJ', 'PG', 'JPM', 'XOM', 'AMZN', 'KO', 'MSFT', 'GOLD', 'CVX'],
-                    '2015-01-01',
-                    '2023-12-30',
-                    "stock_data.xlsx",
-                    UserReturn,
-                    0.044,
-                )
-            except Exception as e:
-                st.error(f"An error occurred: {e}")
-                return
-
-        with st.container(border=True):
-            main_tab1, main_tab2 = st.tabs(["Strategy: Minimum Risk", "Strategy: Target Return"])
-
-            # ---- Minimum Risk ----
-            with main_tab1:
-                sub_tab1, sub_tab2 = st.tabs(["Summary", "Distribution"])
-                with sub_tab1:
-                    st.markdown("#### Optimization Portfolio with Minimum Risk")
-                    w_opt_min = optimizer.singleEquationSolver()
-                    risk_min = optimizer.riskFunction(w_opt_min)
-                    return_min = optimizer.portfolioReturn(w_opt_min)
-
-                    st.markdown(f"**Expected Annual Return**: {return_min:.2%}")
-                    st.markdown(f"**Portfolio Risk**: {risk_min:.2%}")
-                    st.caption("Note: This strategy does not require a target return. The portfolio is optimized to minimize risk, and the resulting return is a byproduct of this optimization.")
-
-                with sub_tab2:
-                    allocations = optimizer.allocation()
-                    allocations["Tickers"] = allocations.index
-
-                    # لا نحتاج لتحويل هنا إذا كان "Allocation (%)" بالفعل بنسبته الصحيحة من الأصل
-                    # allocations["Allocation (%)"] = (
-                    # allocations["Allocation (%)"]
-                    # .astype(str)
-                    # .str.replace('%', '', regex=False)
-                    # .astype(float)
-                    # )
-
-                    st.table(allocations)
-
-                    # --- تعديل Pie Chart إلى Bar Chart للـ Minimum Risk ---
-                    bar_data = allocations[allocations["Allocation (%)"] != "0.00%"].copy() # استخدم copy() لتجنب SettingWithCopyWarning
-                    bar_data["Allocation (%) Numeric"] = bar_data["Allocation (%)"].astype(str).str.replace('%', '', regex=False).astype(float)
-
-                    fig_bar_min_risk = px.bar(
-                        bar_data, 
-                        x="Tickers", 
-                        y="Allocation (%) Numeric", 
-                        title="Asset Allocation (Minimum Risk)",
-                        labels={"Allocation (%) Numeric": "Allocation (%)"}
-                    )
-                    fig_bar_min_risk.update_layout(height=400, margin=dict(t=50, b=0, l=0, r=0))
-                    st.plotly_chart(fig_bar_min_risk, use_container_width=True)
-                    
-                    
-
-            # ---- Target Return ----
-            with main_tab2:
-                sub_tab3, sub_tab4 = st.tabs(["Summary", "Distribution"])
-                with sub_tab3:
-                    st.markdown("#### Optimization Portfolio with Target Return")
-                    daily_target_return = (1 + UserReturn / 100) ** (1/252) - 1
-                    w_opt_target = optimizer.markowitz_optimal_weights_specific_return(daily_target_return)
-                    risk_target = optimizer.riskFunction(w_opt_target)
-                    return_target = optimizer.portfolioReturn(w_opt_target)
-
-                    st.markdown(f"**Expected Annual Return**: {return_target:.2%}")
-                    st.markdown(f"**Portfolio Risk**: {risk_target:.4%}")
-                    st.markdown(f"**Sum of Weights**: {np.sum(w_opt_target):.4f}")
-
-                    investment_required = np.sum(w_opt_target) * money
-                    st.markdown(f"**To achieve your target return of {UserReturn:.2f}%, you need to invest:** ${investment_required:.2f}")
-                    st.caption("Note: The sum of weights exceeds 1 because the optimizer adjusts allocations to meet your return target.")
-
-                with sub_tab4:
-                    allocations_target = optimizer.allocation(
-                        method=optimizer.markowitz_optimal_weights_specific_return,
-                        U=daily_target_return,
-                        money=investment_required
-                    )
-                    allocations_target["Tickers"] = allocations_target.index
-                    st.table(allocations_target)
-
-                    # --- تعديل Pie Chart إلى Bar Chart للـ Target Return ---
-                    # تأكد أنك بتستخدم عمود Investment ($) أو Original Weight هنا
-                    bar_data_target = allocations_target[allocations_target["Allocation (%)"] != "0.00%"].copy()
-                    bar_data_target["Investment ($) Numeric"] = bar_data_target["Investment ($)"] # Assuming it's already numeric or will be
-
-                    fig_bar_target_return = px.bar(
-                        bar_data_target, 
-                        x="Tickers", 
-                        y="Investment ($) Numeric", # أو "Original Weight" لو عايز تعرضها كنسبة
-                        title="Asset Allocation (Target Return) by Investment",
-                        labels={"Investment ($) Numeric": "Investment ($)"}
-                    )
-                    fig_bar_target_return.update_layout(height=400, margin=dict(t=50, b=0, l=0, r=0))
-                    st.plotly_chart(fig_bar_target_return, use_container_width=True)
+        # Submitted inputs outlive the form: later reruns render the same results
+        st.session_state["portfolio_inputs"] = (
+            tuple(sorted(tickers)),
+            str(start_date),
+            str(end_date),
+            store,
+            0.044,
+            UserReturn,
+            money,
+            tuple(sweep_range),
+            parse_budgets(sweep_budgets),
+        )
 
-    # Navigation Buttons
-    time.sleep(1)
-    col1, col2, col3 = st.columns([3, 4, 2])
-    with col1:
-        if st.button("⬅️ Back to Welcome"):
-            st.switch_page("pages/wel.py")
-    with col3:
-        if st.button("➡️ Go to Performance"):
-            st.switch_page("pages/performance.py")
+    inputs = st.session_state.get("portfolio_inputs")
+    if inputs is not None:
+        with trace("calculate", enabled=show_trace) as request_trace:
+            with st.spinner("Buckle Up! Financial Wizardry in Progress...."):
+                try:
+                    # Solved once per set of inputs; the optimizer underneath is
+                    # shared across sessions (one build per universe/window)
+                    results = compute_results(*inputs)
+                except Exception as e:
+                    st.error(f"An error occurred: {e}")
+                    return
 
-main()
+            render_results(results, inputs[5])
 
+        if request_trace is not None:
+            render_trace(request_trace)
 
+    # Navigation Buttons
+    navigation()
+
+main()
@@ -1,5 +1,4 @@
 import streamlit as st
-import time
 
 st.markdown("""
 <style>
@@ -90,10 +89,6 @@ st.markdown("""
 
 
 
-# Effect when switching between pages
-with st.spinner('Loading...'):
-    time.sleep(1)  # Wait before switching
-
 col1, col2, col3 = st.columns([3, 6, 3])
 
 # Go to About Page
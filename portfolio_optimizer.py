@@ -1,59 +1,837 @@
-import yfinance as yf
+# The optimizer core only needs NumPy/pandas at import time. SciPy and yfinance
+# are imported where they are first used, so pages and tools that never touch
+# them do not pay for the import.
+import functools
+import threading
 import numpy as np
 import pandas as pd
-import streamlit as st
-import matplotlib.pyplot as plt
-import plotly.express as px
-from scipy.optimize import minimize
-import time
-import os
-
-# Functional Paradigm: Data downloading with retry mechanism
-def download_data(tickers, start_date, end_date, retries=3, delay=5):
-    for _ in range(retries):
+from collections import namedtuple
+
+from columnar_prices import load_excel_fallback
+from covariance import CHUNK_BYTES, LowRankFactor, chunked_covariance, chunked_mean, estimate as estimate_covariance
+from instrumentation import count, stage, timed
+from price_cache import PriceCache
+from price_fetch import fetch_prices
+from rolling_stats import RunningMoments
+
+# Shared on-disk price store used by every optimizer in this process
+price_cache = PriceCache()
+
+# Functional Paradigm: Data downloading, one concurrent request per ticker with
+# its own exponential backoff. Returns the tickers that could be loaded (from
+# the cache or the network); failed ones are simply absent.
+@timed("download")
+def download_data(tickers, start_date, end_date, retries=3, delay=0.5, cache=price_cache, fetcher=None, max_workers=8):
+    if isinstance(tickers, str):
+        tickers = [tickers]
+
+    def fetch(group, start, end):
+        prices, failed = fetch_prices(group, start, end, fetcher, max_workers, retries, base_delay=delay)
+        count("tickers_fetched", len(group) - len(failed))
+        count("tickers_failed", len(failed))
+        if failed:
+            print(f"Failed to download {', '.join(failed)}.")
+        return prices if len(prices.columns) else None
+
+    if cache is None:
+        prices = fetch(tickers, start_date, end_date)
+    else:
+        # Only the date ranges the cache does not hold yet go to the network
+        prices = cache.get(tickers, start_date, end_date, fetch)
+    if prices is not None:
+        # Tickers without a single bar in the window count as failed
+        prices = prices.dropna(axis=1, how="all")
+        if prices.empty:
+            prices = None
+    if prices is None:
+        print("Failed to download data. Switching to Excel backup...")
+    return prices
+
+# Factorisation of the covariance matrix, computed once and reused by every
+# solver through solves instead of explicit inverses. Cholesky is used while
+# Sigma is comfortably positive definite; near-singular matrices fall back to
+# an eigendecomposition with the smallest eigenvalues floored.
+class CovarianceFactor:
+    def __init__(self, Sigma, rcond=1e-12):
+        from scipy.linalg import cho_factor, cho_solve
+
+        self._cho_solve = cho_solve
+        Sigma = np.asarray(Sigma, dtype=float)
+        self.n = Sigma.shape[0]
+        self.method = "cholesky"
         try:
-            data = yf.download(tickers=tickers, start=start_date, end=end_date)
-            if not data['Adj Close'].empty:
-                return data['Adj Close']
-        except Exception as e:
-            print(f"Download failed: {e}. Retrying in {delay} seconds...")
-            time.sleep(delay)
-    print("Failed to download data. Switching to Excel backup...")
-    return None
+            self._cho = cho_factor(Sigma, lower=True, check_finite=False)
+            diag = np.diag(self._cho[0])
+            # cond(Sigma) ~ (max/min of the Cholesky diagonal) ** 2
+            if not diag.min() > np.sqrt(rcond) * diag.max():
+                raise np.linalg.LinAlgError("Covariance matrix is near-singular")
+        except np.linalg.LinAlgError:
+            self.method = "eigh"
+            self._cho = None
+            values, self._vectors = np.linalg.eigh(Sigma)
+            floor = max(values.max(), np.finfo(float).tiny) * rcond
+            self._values = np.maximum(values, floor)
+
+    @property
+    def nbytes(self):
+        if self._cho is not None:
+            return self._cho[0].nbytes
+        return self._vectors.nbytes + self._values.nbytes
+
+    def solve(self, b):
+        # Sigma^-1 b for a vector or an (n x k) block of right-hand sides
+        b = np.asarray(b, dtype=float)
+        if self._cho is not None:
+            return self._cho_solve(self._cho, b, check_finite=False)
+        scaled = self._vectors.T @ b
+        scaled = scaled / (self._values if b.ndim == 1 else self._values[:, None])
+        return self._vectors @ scaled
+
+def _project_feasible(w, lower, upper, budget):
+    # Euclidean projection onto {lower <= w <= upper} (and sum(w) = 1 with a
+    # budget): clip(w - tau), where f(tau) = sum(clip(w - tau)) is piecewise
+    # linear, so tau is found by binary search over its breakpoints.
+    if not budget:
+        return np.clip(w, lower, upper)
+    if np.all(w >= lower) and np.all(w <= upper) and abs(w.sum() - 1) <= 1e-12:
+        return w.copy()
+    if lower.sum() > 1 + 1e-12 or upper.sum() < 1 - 1e-12:
+        raise ValueError("Weight bounds cannot sum to 1.")
+    breakpoints = np.concatenate([w - upper, w - lower])
+    breakpoints = np.sort(breakpoints[np.isfinite(breakpoints)])
+    breakpoints = np.concatenate([[breakpoints[0] - 1.0], breakpoints])
+    total = lambda tau: np.clip(w - tau, lower, upper).sum()
+    lo, hi = 0, len(breakpoints) - 1
+    while hi - lo > 1:
+        mid = (lo + hi) // 2
+        if total(breakpoints[mid]) > 1:
+            lo = mid
+        else:
+            hi = mid
+    t0, t1 = breakpoints[lo], breakpoints[hi]
+    f0, f1 = total(t0), total(t1)
+    tau = t0 if f0 == f1 else t0 + (f0 - 1) * (t1 - t0) / (f0 - f1)
+    return np.clip(w - tau, lower, upper)
+
+
+class _KKTFactor:
+    # Solves the equality-constrained system on the free assets F,
+    #     [0 1'; 1 S_FF]   (or S_FF alone without a budget constraint),
+    # from a Cholesky factor L of S on a base set F0 containing F; nothing is
+    # ever inverted. An asset entering F extends L by one row (O(|F0|^2)). An
+    # asset leaving F stays in F0 and is held at zero through the Schur
+    # complement C = E'S^-1 E of the removed set E instead, so a removal
+    # costs one pair of triangular solves. The base is refactored once
+    # `max_removed` assets have left it or after `refresh` updates (to
+    # bound round-off drift); a singular block gets a tiny ridge. The
+    # budget row is eliminated through its own Schur complement. L is kept
+    # in Fortran order and solved with LAPACK directly: the solver makes
+    # many small solves, where scipy.linalg's wrappers cost more than the
+    # arithmetic.
+    def __init__(self, Sigma, budget, refresh=64, max_removed=32):
+        from scipy.linalg.lapack import dgesv, dpotrs, dtrtrs
+
+        self._gesv, self._potrs, self._trtrs = dgesv, dpotrs, dtrtrs
+        self.Sigma = Sigma
+        self.budget = budget
+        self.refresh = refresh
+        self.max_removed = max_removed
+        self.free = []
+        self.L = None
+        self.updates = 0
+
+    def reset(self, free):
+        self.free = list(free)
+        self.base = list(self.free)
+        self._position = list(range(len(self.free)))
+        self._removed = []
+        self.updates = 0
+        if not self.free:
+            self.L = None
+            return
+        F = np.asarray(self.free)
+        K = self.Sigma[np.ix_(F, F)]
+        try:
+            L = np.linalg.cholesky(K)
+        except np.linalg.LinAlgError:
+            ridge = 1e-12 * max(np.trace(K) / len(F), np.finfo(float).tiny)
+            L = np.linalg.cholesky(K + ridge * np.eye(len(F)))
+        self.L = np.asfortranarray(L)
+        self._W = np.empty((len(F), 0))   # S_F0^-1 E
+
+    @property
+    def nbytes(self):
+        return 0 if self.L is None else self.L.nbytes + self._W.nbytes
+
+    def _base_solve(self, b):
+        return self._potrs(self.L, b, lower=1)[0]
+
+    def add(self, j):
+        if self.L is None or self.updates >= self.refresh:
+            self.reset(self.free + [j])
+            return
+        if j in self.base:
+            # Back from the removed set: just stop holding it at zero
+            p = self.base.index(j)
+            keep = [i for i, q in enumerate(self._removed) if q != p]
+            self._removed = [self._removed[i] for i in keep]
+            self._W = self._W[:, keep]
+        else:
+            u = self.Sigma[self.base, j]
+            l = self._trtrs(self.L, u, lower=1)[0]
+            s = self.Sigma[j, j] - l @ l
+            if not s > 1e-12 * self.Sigma[j, j]:
+                self.reset(self.free + [j])
+                return
+            m = len(l)
+            if self._removed:
+                # Bordered inverse applied to the removed columns
+                v = self._trtrs(self.L, l, lower=1, trans=1)[0]
+            L = np.zeros((m + 1, m + 1), order="F")
+            L[:m, :m] = self.L
+            L[m, :m] = l
+            L[m, m] = np.sqrt(s)
+            self.L = L
+            if self._removed:
+                t = v[self._removed] / s
+                self._W = np.vstack([self._W + np.outer(v, t), -t])
+            else:
+                self._W = np.empty((m + 1, 0))
+            self.base.append(j)
+            p = m
+        self.free.append(j)
+        self._position.append(p)
+        self.updates += 1
+
+    def remove(self, j):
+        k = self.free.index(j)
+        self.free.pop(k)
+        p = self._position.pop(k)
+        if not self.free or self.updates >= self.refresh or len(self._removed) >= self.max_removed:
+            self.reset(self.free)
+            return
+        e = np.zeros(len(self.base))
+        e[p] = 1.0
+        self._W = np.column_stack([self._W, self._base_solve(e)])
+        self._removed.append(p)
+        self.updates += 1
+
+    def sync(self, free):
+        # Move to a new free set, incrementally when it differs only slightly.
+        current = set(self.free)
+        wanted = set(int(i) for i in free)
+        if self.L is None or len(current ^ wanted) > max(8, len(wanted) // 4):
+            self.reset(sorted(wanted))
+            return
+        for j in current - wanted:
+            self.remove(j)
+        for j in sorted(wanted - current):
+            self.add(j)
+
+    def _free_solve(self, b):
+        # S_FF^-1 b for the columns of b (rows in self.free order)
+        full = np.zeros((len(self.base),) + b.shape[1:])
+        full[self._position] = b
+        z = self._base_solve(full)
+        if self._removed:
+            W = self._W
+            _, _, y, info = self._gesv(W[self._removed], z[self._removed])
+            if info:
+                raise np.linalg.LinAlgError("Singular Schur complement in the KKT update")
+            z = z - W @ y
+        return z[self._position]
+
+    def solve(self, rhs, total=0.0):
+        # Returns (w_F, nu) for S_FF w_F + nu 1 = rhs, 1'w_F = total.
+        if not self.budget:
+            return self._free_solve(rhs), 0.0
+        x, y = self._free_solve(np.column_stack([rhs, np.ones(len(rhs))])).T
+        nu = (x.sum() - total) / y.sum()
+        return x - nu * y, nu
+
+
+class _LowRankKKT(_KKTFactor):
+    # The same system for Sigma = diag(d) + B B' (a LowRankFactor), solved
+    # by Woodbury on the free block,
+    #     S_FF^-1 = D_F^-1 - D_F^-1 B_F C^-1 B_F' D_F^-1,  C = I + B_F' D_F^-1 B_F,
+    # so only the k x k capacitance C is kept. An asset entering or leaving F
+    # is a rank-one update of C (O(k^2)) and a solve costs O(|F| k + k^3);
+    # nothing of size |F| x |F| is ever formed. C is rebuilt every `refresh`
+    # updates to bound round-off drift.
+    def __init__(self, model, budget, refresh=64):
+        self.model = model
+        self.budget = budget
+        self.refresh = refresh
+        self.free = []
+        self.updates = 0
+        self._capacitance = None
+
+    @property
+    def nbytes(self):
+        return 0 if self._capacitance is None else self._capacitance.nbytes
+
+    def reset(self, free):
+        self.free = list(free)
+        self.updates = 0
+        F = np.asarray(self.free, dtype=int)
+        self._capacitance = np.eye(self.model.k) + self.model.B[F].T @ self.model._DinvB[F]
+
+    def add(self, j):
+        if self._capacitance is None or self.updates >= self.refresh:
+            self.reset(self.free + [j])
+            return
+        self.free.append(j)
+        self._capacitance += np.outer(self.model.B[j], self.model._DinvB[j])
+        self.updates += 1
+
+    def remove(self, j):
+        self.free.remove(j)
+        if self.updates >= self.refresh:
+            self.reset(self.free)
+            return
+        self._capacitance -= np.outer(self.model.B[j], self.model._DinvB[j])
+        self.updates += 1
+
+    def sync(self, free):
+        current = set(self.free)
+        wanted = set(int(i) for i in free)
+        if self._capacitance is None or len(current ^ wanted) > len(wanted):
+            self.reset(sorted(wanted))
+            return
+        for j in current - wanted:
+            self.remove(j)
+        for j in sorted(wanted - current):
+            self.add(j)
+
+    def _free_solve(self, b):
+        F = np.asarray(self.free, dtype=int)
+        d, DinvB = self.model.d[F], self.model._DinvB[F]
+        d = d if b.ndim == 1 else d[:, None]
+        return b / d - DinvB @ np.linalg.solve(self._capacitance, DinvB.T @ b)
+
+
+def _active_set_qp(Sigma, q, lower, upper, budget=True, w0=None, kkt=None, max_iter=None, tol=1e-10):
+    # Primal active-set method for
+    #     min 1/2 w' Sigma w + q' w   s.t.  lower <= w <= upper  (and sum(w) = 1)
+    # Each iteration solves the equality problem on the free assets. A step
+    # that would cross a bound pins that asset; at a stationary point the
+    # pinned asset with the most wrong-signed multiplier is released.
+    # Passing the previous call's `kkt` reuses its factorisation. Sigma is a
+    # dense matrix or a LowRankFactor; the latter is only used through
+    # matvec and Woodbury solves, in O(n k) memory.
+    # Returns (w, nu, kkt, iterations).
+    n = len(q)
+    if isinstance(Sigma, LowRankFactor):
+        product, diagonal = Sigma.matvec, Sigma.diagonal()
+        rows = lambda F, v: product(v)[F]
+        kkt = kkt if kkt is not None else _LowRankKKT(Sigma, budget)
+    else:
+        product, diagonal = Sigma.dot, np.diag(Sigma)
+        rows = lambda F, v: Sigma[F] @ v
+        kkt = kkt if kkt is not None else _KKTFactor(Sigma, budget)
+    w = _project_feasible(np.zeros(n) if w0 is None else np.asarray(w0, dtype=float), lower, upper, budget)
+    at_lower = w <= lower
+    at_upper = (w >= upper) & ~at_lower
+    kkt.sync(np.flatnonzero(~(at_lower | at_upper)))
+    # max |Sigma_ij| is on the diagonal for a covariance matrix
+    grad_tol = tol * (diagonal.max() + np.abs(q).max() + np.finfo(float).tiny)
+    max_iter = max_iter or 10 * n + 100
+    nu = 0.0
+    for iteration in range(1, max_iter + 1):
+        if kkt.free:
+            F = np.asarray(kkt.free)
+            pinned = w.copy()
+            pinned[F] = 0.0
+            rhs = -q[F] - rows(F, pinned)
+            target, nu = kkt.solve(rhs, 1.0 - pinned.sum())
+            w_F = w[F]
+            step = target - w_F
+            # Largest feasible fraction of the step before each free asset hits a bound
+            with np.errstate(divide="ignore", invalid="ignore"):
+                alphas = np.where(step < 0, (lower[F] - w_F) / step, np.where(step > 0, (upper[F] - w_F) / step, np.inf))
+            k = int(np.argmin(alphas))
+            if alphas[k] < 1:
+                w[F] += max(alphas[k], 0.0) * step
+                j = int(F[k])
+                if step[k] < 0:
+                    at_lower[j], w[j] = True, lower[j]
+                else:
+                    at_upper[j], w[j] = True, upper[j]
+                kkt.remove(j)
+                continue
+            w[F] = target
+        elif budget:
+            # Everything pinned: nu may be any value that keeps the multipliers
+            # sign-correct; take the middle of that interval.
+            g = product(w) + q
+            lo = np.max(-g[at_lower]) if at_lower.any() else -np.inf
+            hi = np.min(-g[at_upper]) if at_upper.any() else np.inf
+            nu = 0.5 * (lo + hi) if np.isfinite(lo) and np.isfinite(hi) else (lo if np.isfinite(lo) else hi)
+
+        # Stationary on the current free set: check the pinned multipliers.
+        g = product(w) + q + nu
+        violation = np.zeros(n)
+        violation[at_lower] = -g[at_lower]
+        violation[at_upper] = g[at_upper]
+        j = int(np.argmax(violation))
+        if violation[j] <= grad_tol:
+            return w, nu, kkt, iteration
+        at_lower[j] = at_upper[j] = False
+        kkt.add(j)
+    raise RuntimeError("Active-set QP solver did not converge.")
+
+
+def _return_range(mu, lower, upper):
+    # Portfolios with the lowest and highest expected return reachable with
+    # sum(w) = 1 inside the bounds: fill the box greedily in order of mu.
+    # No asset can take more than the budget left above the lower bounds,
+    # which also keeps infinite upper bounds out of the cumulative sum.
+    def greedy(order):
+        capacity = np.minimum(upper - lower, max(1.0 - lower.sum(), 0.0))[order]
+        filled = np.cumsum(capacity) - capacity
+        w = lower.copy()
+        w[order] += np.clip(1.0 - lower.sum() - filled, 0.0, capacity)
+        return w
+    order = np.argsort(mu)
+    return greedy(order), greedy(order[::-1])
+
+
+def _serialized(method):
+    # Solvers are cached on optimizers that sessions and worker threads
+    # share; one call at a time mutates the KKT factor and warm start. The
+    # memory footprint is re-measured on the way out, so readers (cache
+    # sizing) never look at a factor in the middle of an update.
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self._lock:
+            try:
+                return method(self, *args, **kwargs)
+            finally:
+                self.nbytes = self._footprint()
+    return wrapper
+
+
+# Long-only / box-constrained mean-variance solver. Keeps the last solution and
+# risk-aversion multiplier so that consecutive calls (e.g. walking along a
+# frontier) warm-start from the previous point.
+class ConstrainedSolver:
+    def __init__(self, Sigma, mu, lower=0.0, upper=1.0):
+        # Sigma: dense matrix, or a LowRankFactor that is kept low-rank
+        self.Sigma = Sigma if isinstance(Sigma, LowRankFactor) else np.asarray(Sigma, dtype=float)
+        self.mu = np.asarray(mu, dtype=float)
+        n = len(self.mu)
+        self.lower = np.broadcast_to(np.asarray(lower, dtype=float), (n,)).copy()
+        self.upper = np.broadcast_to(np.asarray(upper, dtype=float), (n,)).copy()
+        self.last_weights = None
+        self.last_lambda = 0.0
+        self.iterations = 0
+        self._kkt = {}
+        self._lock = threading.RLock()
+        self.nbytes = self._footprint()
+
+    def _footprint(self):
+        # KKT factors, plus a dense Sigma when it is a copy rather than a
+        # view of the optimizer's matrix
+        nbytes = 0
+        if isinstance(self.Sigma, np.ndarray) and self.Sigma.flags.owndata:
+            nbytes += self.Sigma.nbytes
+        return nbytes + sum(kkt.nbytes for kkt in self._kkt.values())
+
+    def _solve(self, q, budget, w0):
+        w, nu, self._kkt[budget], iterations = _active_set_qp(
+            self.Sigma, q, self.lower, self.upper, budget, w0, self._kkt.get(budget)
+        )
+        return w, iterations
+
+    @_serialized
+    def min_variance(self, w0=None):
+        w0 = self.last_weights if w0 is None else w0
+        w, self.iterations = self._solve(np.zeros_like(self.mu), True, w0)
+        self.last_weights, self.last_lambda = w, 0.0
+        return w
+
+    @_serialized
+    def target_return(self, target, w0=None, tol=1e-10):
+        # min w'Sigma w  s.t.  mu'w = target, sum(w) = 1, lower <= w <= upper.
+        # Solved as min 1/2 w'Sigma w - lam mu'w over lam: mu'w(lam) is
+        # monotone and piecewise linear, so a safeguarded Newton step on lam
+        # lands on the right piece in a handful of warm-started solves.
+        if not np.isfinite(target):
+            raise ValueError(f"Target return must be finite, got {target}.")
+        w_min, w_max = _return_range(self.mu, self.lower, self.upper)
+        r_min, r_max = self.mu @ w_min, self.mu @ w_max
+        scale = np.abs(self.mu).max() + np.finfo(float).tiny
+        if target < r_min - tol * scale or target > r_max + tol * scale:
+            raise ValueError(f"Target return {target:.6g} is outside the attainable range [{r_min:.6g}, {r_max:.6g}].")
+        if target >= r_max - tol * scale or target <= r_min + tol * scale:
+            self.iterations = 0
+            self.last_weights = w_max if target >= r_max - tol * scale else w_min
+            return self.last_weights
+
+        w = self.last_weights if w0 is None else w0
+        lam, lo, hi = self.last_lambda, -np.inf, np.inf
+        lam_scale = self.Sigma.diagonal().sum() / len(self.mu) / scale
+        self.iterations = 0
+        for _ in range(200):
+            w, iterations = self._solve(-lam * self.mu, True, w)
+            self.iterations += iterations
+            error = self.mu @ w - target
+            if abs(error) <= tol * scale:
+                self.last_weights, self.last_lambda = w, lam
+                return w
+            if error < 0:
+                lo = lam
+            else:
+                hi = lam
+            # d(mu'w)/d(lam) on the current free set
+            kkt = self._kkt[True]
+            slope = 0.0
+            if kkt.free:
+                d, _ = kkt.solve(self.mu[kkt.free])
+                slope = self.mu[kkt.free] @ d
+            new_lam = lam - error / slope if slope > 0 else np.nan
+            if not lo < new_lam < hi:
+                if np.isfinite(lo) and np.isfinite(hi):
+                    new_lam = 0.5 * (lo + hi)
+                else:
+                    new_lam = lam + np.sign(-error) * max(2 * abs(lam), lam_scale)
+            lam = new_lam
+        raise RuntimeError("Target-return QP did not converge.")
+
+    @_serialized
+    def max_return_per_risk(self, w0=None, mu=None):
+        # min 1/2 w'Sigma w - mu'w with w >= lower and no budget; scaling the
+        # result gives the long-only direction with the best mu'w / w'Sigma w.
+        # mu defaults to the solver's; passing another (e.g. excess returns)
+        # still reuses the factorisation, which depends on Sigma only.
+        w0 = self.last_weights if w0 is None else w0
+        mu = self.mu if mu is None else np.asarray(mu, dtype=float)
+        w, self.iterations = self._solve(-mu, False, w0)
+        return w
+
+
+# Batch of frontier portfolios: weights is (k x n), the other fields have length
+# k. targets are per-period returns (same units as U), returns/volatilities are
+# annualised.
+EfficientFrontier = namedtuple("EfficientFrontier", ["targets", "weights", "returns", "volatilities", "sharpe"])
+
+# Tangency (max-Sharpe) portfolio and points on the capital market line
+# rf + sharpe * volatility through it; everything annualised.
+CapitalMarketLine = namedtuple("CapitalMarketLine", ["weights", "return_", "volatility", "sharpe", "volatilities", "returns"])
+
+# Annual return, volatility, Sharpe ratio and the share of variance each asset
+# contributes, for every row of a weight matrix
+PortfolioEvaluation = namedtuple("PortfolioEvaluation", ["returns", "volatilities", "sharpe", "risk_contributions"])
+
+# Grid of target-return scenarios: weights / returns / risks / sum_weights per
+# annual target, investment_required per (target, budget)
+ScenarioSweep = namedtuple("ScenarioSweep", ["annual_targets", "budgets", "weights", "returns", "risks",
+                                             "sum_weights", "investment_required"])
+
+# Result of PortfolioOptimizer.allocation(): raw float arrays, formatted only
+# when a table is rendered (to_frame).
+class AllocationResult:
+    __slots__ = ("tickers", "weights", "investments")
+
+    def __init__(self, tickers, weights, investments=None):
+        self.tickers = np.asarray(tickers)
+        self.weights = np.asarray(weights, dtype=float)
+        self.investments = None if investments is None else np.asarray(investments, dtype=float)
+
+    def __len__(self):
+        return len(self.weights)
+
+    @property
+    def total_weight(self):
+        return self.weights.sum()
+
+    @property
+    def percentages(self):
+        return self.weights * 100
+
+    def nonzero(self, decimals=2):
+        # Positions that do not round to 0.00% in the table
+        return np.round(self.percentages, decimals) != 0
+
+    @timed("allocation_table")
+    def to_frame(self, total=True, formatted=True):
+        # Display table: Original Weight, Allocation (%)[, Investment ($)] with
+        # an optional Total row; formatted=False keeps the percentages numeric.
+        columns = {"Original Weight": self.weights, "Allocation (%)": self.percentages}
+        if self.investments is not None:
+            columns["Investment ($)"] = self.investments
+        index = list(self.tickers)
+        if total:
+            columns = {name: np.append(values, values.sum()) for name, values in columns.items()}
+            index.append("Total")
+        frame = pd.DataFrame(columns, index=index)
+        if formatted:
+            frame["Allocation (%)"] = ["{:.2f}%".format(p) for p in frame["Allocation (%)"]]
+        return frame
+
+# Bars per year and the pandas resample rule used for each supported frequency
+FREQUENCIES = {
+    "daily": (252, None),
+    "weekly": (52, "W-FRI"),
+    "monthly": (12, "ME"),
+}
+
+def annual_to_daily_return(annual_return_pct, periods_per_year=252):
+    # Per-period return compounding to annual_return_pct (in percent)
+    return (1 + np.asarray(annual_return_pct, dtype=float) / 100) ** (1 / periods_per_year) - 1
+
+def load_prices(stocks, start, end, excel_file, fetcher=None):
+    prices = download_data(stocks, start, end, fetcher=fetcher)
+    if prices is None:
+        # Memory-mapped columnar copy of the workbook (converted on first use),
+        # limited to the requested tickers and window like a download
+        with stage("excel_fallback"):
+            return load_excel_fallback(excel_file, stocks, start, end)
+    missing = [t for t in stocks if t not in prices.columns]
+    if missing:
+        # Partial success: fill the failed tickers from the Excel backup
+        try:
+            with stage("excel_fallback"):
+                backup = load_excel_fallback(excel_file, missing, start, end)
+        except FileNotFoundError:
+            backup = None
+        if backup is not None and not backup.empty:
+            print(f"Using Excel backup for {', '.join(backup.columns)}.")
+            prices = prices.join(backup, how="left")
+    return prices
 
 class PortfolioOptimizer:
-    def __init__(self, stocks, start, end, excel_file, target_return, riskFreeRate=0.044):
+    def __init__(self, stocks, start, end, excel_file, target_return, riskFreeRate=0.044, frequency="daily",
+                 covariance="sample", covariance_options=None, compact=False):
+        self._configure(stocks, start, end, excel_file, target_return, riskFreeRate, frequency, covariance,
+                        covariance_options, compact)
+        self._initialize(self.basicMetrics())
+
+    @classmethod
+    def from_prices(cls, prices, target_return=None, riskFreeRate=0.044, frequency="daily", excel_file=None,
+                    covariance="sample", covariance_options=None, compact=False):
+        # Build from an in-memory price panel (dates x tickers), no download
+        optimizer = cls.__new__(cls)
+        optimizer._configure(list(prices.columns), prices.index[0], prices.index[-1], excel_file, target_return,
+                             riskFreeRate, frequency, covariance, covariance_options, compact)
+        optimizer._initialize(prices)
+        return optimizer
+
+    @classmethod
+    def from_returns(cls, returns, target_return=None, riskFreeRate=0.044, frequency="daily",
+                     covariance="sample", covariance_options=None, compact=False):
+        # Build from log returns that are already computed (e.g. a slice of a
+        # larger returns matrix); self.prices is None for these optimizers.
+        # With compact=True the frame may wrap a float32 np.memmap: it is
+        # only read in blocks of rows and never copied.
+        optimizer = cls.__new__(cls)
+        optimizer._configure(list(returns.columns), returns.index[0], returns.index[-1], None, target_return,
+                             riskFreeRate, frequency, covariance, covariance_options, compact)
+        optimizer.prices = None
+        optimizer._initialize_returns(returns)
+        return optimizer
+
+    def _configure(self, stocks, start, end, excel_file, target_return, riskFreeRate, frequency,
+                   covariance="sample", covariance_options=None, compact=False):
+        # compact=True keeps self.returns in float32 and estimates pBar and the
+        # sample Sigma block by block with float64 accumulators, so no full
+        # float64 copy of the returns is ever made.
+        if frequency not in FREQUENCIES:
+            raise ValueError(f"Unknown frequency '{frequency}'. Use one of {list(FREQUENCIES)}.")
         self.stocks = stocks
         self.start = start
         self.end = end
         self.excel_file = excel_file
         self.target_return = target_return
         self.riskFreeRate = riskFreeRate
+        self.frequency = frequency
+        self.periods_per_year, self._resample_rule = FREQUENCIES[frequency]
+        self.covariance = covariance
+        self.covariance_options = dict(covariance_options or {})
+        self.compact = compact
 
-        self.prices = self.basicMetrics()
-        if self.prices is not None and not self.prices.empty:
-            n_assets = len(self.prices.columns)
-            self.weights = np.array([1.0 / n_assets] * n_assets)
-        else:
+    def _initialize(self, prices):
+        self.prices = prices
+        if self._resample_rule is not None and self.prices is not None:
+            self.prices = self.prices.resample(self._resample_rule).last().dropna(how="all")
+        if self.prices is None or self.prices.empty:
             raise ValueError("Price data is empty. Cannot initialize weights.")
+        self._initialize_returns(self._log_returns(self.prices))
 
-        self.returns = np.log(self.prices / self.prices.shift(1)).dropna()
-        self.pBar = self.returns.mean()
-        self.Sigma = self.returns.cov()
-        self.meanReturns, self.covMatrix = self.pBar, self.Sigma
+    @timed("log_returns")
+    def _log_returns(self, prices):
+        if not self.compact:
+            return np.log(prices / prices.shift(1)).dropna()
+        # float32 output filled block by block (float64 only inside a block)
+        values = prices.to_numpy()
+        returns = np.empty((max(len(values) - 1, 0), values.shape[1]), dtype=np.float32)
+        step = max(1, CHUNK_BYTES // (2 * 8 * max(values.shape[1], 1)))
+        for lo in range(0, len(returns), step):
+            block = np.asarray(values[lo:lo + step + 1], dtype=np.float64)
+            returns[lo:lo + step] = np.log(block[1:] / block[:-1])
+        keep = ~np.isnan(returns).any(axis=1)
+        if not keep.all():
+            returns = returns[keep]
+        return pd.DataFrame(returns, index=prices.index[1:][keep], columns=prices.columns, copy=False)
 
-        # Optional: initialize optimized allocation with minimum risk
-        self.optimized_allocation = self.allocation()
+    def _initialize_returns(self, returns):
+        n_assets = len(returns.columns)
+        self.weights = np.array([1.0 / n_assets] * n_assets)
+
+        if self.compact:
+            self.returns = returns.astype(np.float32, copy=False)
+            self.pBar = pd.Series(chunked_mean(self._returns_values()), index=returns.columns)
+        else:
+            self.returns = returns
+            self.pBar = self.returns.mean()
+        self.meanReturns = self.pBar
+        self.use_covariance(self.covariance, **self.covariance_options)
+        self._optimized_allocation = None
+
+    def subset(self, tickers):
+        # Optimizer for some of this universe's tickers over the same window.
+        # If dropping the other tickers keeps exactly the same return rows
+        # (no bar was dropped only because of them), pBar and Sigma are
+        # sliced from this optimizer instead of being re-estimated; the
+        # universe-dependent estimators (ledoit_wolf, factor) are re-estimated.
+        tickers = list(tickers)
+        optimizer = type(self).__new__(type(self))
+        optimizer._configure(tickers, self.start, self.end, self.excel_file, self.target_return, self.riskFreeRate,
+                             self.frequency, self.covariance, self.covariance_options, self.compact)
+        if self.prices is None:
+            optimizer.prices = None
+            same_rows = True
+        else:
+            optimizer.prices = self.prices[tickers]
+            valid = optimizer.prices.notna().all(axis=1).to_numpy()
+            same_rows = np.count_nonzero(valid[1:] & valid[:-1]) == len(self.returns)
+        if not same_rows:
+            optimizer._initialize_returns(optimizer._log_returns(optimizer.prices))
+        elif self.covariance in ("sample", "ewma"):
+            optimizer.weights = np.full(len(tickers), 1.0 / len(tickers))
+            optimizer.returns = self.returns[tickers]
+            optimizer.pBar = optimizer.meanReturns = self.pBar[tickers]
+            optimizer.Sigma = self.Sigma.loc[tickers, tickers]
+            optimizer._optimized_allocation = None
+        else:
+            optimizer._initialize_returns(self.returns[tickers])
+        return optimizer
+
+    def _returns_values(self):
+        # The returns block without a copy (a view of the frame's data)
+        return self.returns.to_numpy(copy=False)
+
+    @timed("covariance")
+    def use_covariance(self, estimator="sample", **options):
+        # Re-estimate Sigma from self.returns ("sample", "ledoit_wolf",
+        # "ewma" with halflife=..., "factor" with factors=...). The factor
+        # model is kept low-rank: solves, including the long-only QPs, go
+        # through Woodbury and the dense Sigma is only built if something
+        # asks for it.
+        if estimator == "sample" and self.compact:
+            Sigma = chunked_covariance(self._returns_values(), self.pBar.to_numpy())
+        elif estimator == "sample":
+            Sigma = self.returns.cov()
+        else:
+            Sigma = estimate_covariance(self.returns.to_numpy(dtype=float), estimator, **options)
+        self.covariance, self.covariance_options = estimator, options
+        if isinstance(Sigma, LowRankFactor):
+            self.Sigma = None
+            self.covariance_model = self._factor = Sigma
+        else:
+            self.Sigma = pd.DataFrame(Sigma, index=self.pBar.index, columns=self.pBar.index)
+        return self
+
+    @property
+    def optimized_allocation(self):
+        # Minimum-risk allocation, built on first access rather than on every
+        # construction (backtests create one optimizer per window)
+        if self._optimized_allocation is None:
+            self._optimized_allocation = self.allocation()
+        return self._optimized_allocation
+
+    @property
+    def Sigma(self):
+        if self._Sigma is None and self.covariance_model is not None:
+            # Dense view of a low-rank model, built on first use
+            index = self.pBar.index
+            self._Sigma = pd.DataFrame(self.covariance_model.to_dense(), index=index, columns=index)
+        return self._Sigma
+
+    @Sigma.setter
+    def Sigma(self, value):
+        # Any new covariance invalidates the cached factorisation
+        self._Sigma = value
+        self._factor = None
+        self._solvers = {}
+        self._optimized_allocation = None
+        self.covariance_model = None
+
+    @property
+    def covMatrix(self):
+        return self.Sigma
+
+    def covariance_factor(self):
+        if self._factor is None:
+            with stage("factorize"):
+                self._factor = CovarianceFactor(self.Sigma)
+        return self._factor
+
+    def track_moments(self, window=None, halflife=None):
+        # Switch pBar/Sigma to incrementally maintained estimates seeded from
+        # the current returns; append_prices() / append_returns() then update
+        # them per bar.
+        self.moments = RunningMoments.from_returns(self.returns.values, window, halflife)
+        self._publish_moments()
+        return self.moments
+
+    def append_prices(self, new_prices):
+        # New bars (rows indexed by date, same columns as self.prices) update
+        # pBar and Sigma in O(n^2) per bar without touching the full history.
+        # self.prices / self.returns keep the construction-time history.
+        # A ticker without a price on some bar keeps its last one (a zero
+        # return); bars without any price are skipped.
+        if self.prices is None:
+            raise ValueError("This optimizer was built from returns; pass new bars to append_returns() instead.")
+        if getattr(self, "moments", None) is None:
+            self.track_moments()
+        last = getattr(self, "_last_price", None)
+        if last is None:
+            last = self.prices.ffill().iloc[-1].to_numpy(dtype=float)
+        for row in new_prices[self.prices.columns].to_numpy(dtype=float):
+            missing = np.isnan(row)
+            if missing.all():
+                continue
+            row = np.where(missing, last, row)
+            self.moments.add(np.log(row / last))
+            last = row
+        self._last_price = last
+        self._publish_moments()
+
+    def append_returns(self, new_returns):
+        # append_prices() for log-return rows (columns as pBar), e.g. for
+        # optimizers built with from_returns(). Missing returns count as zero.
+        if getattr(self, "moments", None) is None:
+            self.track_moments()
+        for row in new_returns[self.pBar.index].to_numpy(dtype=float):
+            missing = np.isnan(row)
+            if not missing.all():
+                self.moments.add(np.where(missing, 0.0, row))
+        self._publish_moments()
+
+    def _publish_moments(self):
+        index = self.pBar.index
+        self.pBar = pd.Series(self.moments.mean, index=index)
+        self.Sigma = pd.DataFrame(self.moments.cov, index=index, columns=index)
+        self.meanReturns = self.pBar
 
     def basicMetrics(self):
-        prices = download_data(self.stocks, self.start, self.end)
-        if prices is None:
-            try:
-                prices = pd.read_excel(self.excel_file, index_col=0, parse_dates=True)
-            except FileNotFoundError:
-                st.error(f"❌ Excel file '{self.excel_file}' not found. Please upload it.")
-                raise
-        return prices
+        # No UI calls here: callers (the Streamlit pages, the batch CLI) decide
+        # how to report the error.
+        try:
+            return load_prices(self.stocks, self.start, self.end, self.excel_file)
+        except FileNotFoundError as e:
+            raise FileNotFoundError(f"Excel file '{self.excel_file}' not found. Please upload it.") from e
 
     def getData(self):
         meanReturns = self.returns.mean()
@@ -61,117 +839,364 @@ class PortfolioOptimizer:
         return meanReturns, covMatrix
 
     def calculate_metrics(self):
-        port_variance = self.portfolio_variance(self.weights, self.Sigma)
-        port_annual_ret = np.sum(self.pBar * self.weights) * 252
+        port_variance = self.portfolio_variance(self.weights)
+        port_annual_ret = np.sum(self.pBar * self.weights) * self.periods_per_year
         port_volatility = np.sqrt(port_variance)
         sharpe_ratio = (port_annual_ret - self.riskFreeRate) / port_volatility
         return port_annual_ret, port_volatility, port_variance, sharpe_ratio
 
-    def portfolio_variance(self, weights, Sigma):
-        return np.dot(weights.T, np.dot(Sigma, weights)) * 252
+    def portfolio_variance(self, weights, Sigma=None):
+        # Without an explicit Sigma a low-rank model is used as is, so the
+        # dense matrix is never built just to price one portfolio
+        if Sigma is None:
+            if self.covariance_model is not None:
+                return self.covariance_model.quadratic(weights) * self.periods_per_year
+            Sigma = self.Sigma
+        return np.dot(weights.T, np.dot(Sigma, weights)) * self.periods_per_year
+
+    def _cross(self, W):
+        # W @ Sigma for an (m x n) block of portfolios, through the low-rank
+        # model when there is one
+        if self.covariance_model is not None:
+            return self.covariance_model.matvec(W.T).T
+        return W @ np.asarray(self.Sigma, dtype=float)
+
+    def variances(self):
+        # Per-period variance of each asset (the diagonal of Sigma)
+        if self.covariance_model is not None:
+            return self.covariance_model.diagonal()
+        return np.diag(np.asarray(self.Sigma, dtype=float))
 
     def portfolioReturn(self, weights):  
-        return np.sum(self.pBar * weights) * 252
+        return np.sum(self.pBar * weights) * self.periods_per_year
 
     def portfolioPerformance(self, weights):
-        port_annual_ret = np.sum(self.meanReturns * weights) * 252
-        port_variance = self.portfolio_variance(weights, self.Sigma)
+        port_annual_ret = np.sum(self.meanReturns * weights) * self.periods_per_year
+        port_variance = self.portfolio_variance(weights)
         port_volatility = np.sqrt(port_variance)
         return port_annual_ret, port_volatility
 
+    @timed("evaluate_portfolios")
+    def evaluate_portfolios(self, W, contributions=True, memory_budget=64 * 1024 ** 2):
+        # Metrics for m portfolios at once; W is an (m x n) array or a scipy
+        # sparse matrix with columns in pBar order. Rows are processed in
+        # blocks sized so W_block @ Sigma and one temporary fit in
+        # memory_budget bytes. risk_contributions is (m x n), dense for dense
+        # W and CSR for sparse W, with rows summing to 1 (None when
+        # contributions=False).
+        sparse = hasattr(W, "tocsr")
+        W = W.tocsr() if sparse else np.atleast_2d(np.asarray(W, dtype=float))
+        m, n = W.shape
+        pBar = np.asarray(self.pBar, dtype=float)
+        if self.covariance_model is not None:
+            cross = lambda block: self.covariance_model.matvec(block.T).T
+        else:
+            Sigma = np.asarray(self.Sigma, dtype=float)
+            cross = lambda block: block @ Sigma
+
+        returns = np.asarray(W @ pBar).ravel() * self.periods_per_year
+        variances = np.empty(m)
+        blocks = []
+        chunk = max(1, int(memory_budget // (2 * 8 * n)))
+        for lo in range(0, m, chunk):
+            block = W[lo:lo + chunk]
+            WS = cross(block.toarray() if sparse and self.covariance_model is not None else block)
+            products = block.multiply(WS).tocsr() if sparse else block * WS
+            block_variance = np.asarray(products.sum(axis=1)).ravel()
+            variances[lo:lo + chunk] = block_variance
+            if contributions:
+                with np.errstate(divide="ignore", invalid="ignore"):
+                    scale = np.where(block_variance > 0, 1 / block_variance, np.nan)
+                blocks.append(products.multiply(scale[:, None]).tocsr() if sparse else products * scale[:, None])
+
+        volatilities = np.sqrt(np.maximum(variances, 0) * self.periods_per_year)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            sharpe = (returns - self.riskFreeRate) / volatilities
+        risk_contributions = None
+        if contributions:
+            if sparse:
+                import scipy.sparse
+
+                risk_contributions = scipy.sparse.vstack(blocks, format="csr") if blocks else scipy.sparse.csr_matrix((0, n))
+            else:
+                risk_contributions = np.vstack(blocks) if blocks else np.empty((0, n))
+        return PortfolioEvaluation(returns, volatilities, sharpe, risk_contributions)
+
+    def iter_random_portfolios(self, n_portfolios, method="dirichlet", alpha=1.0, memory_budget=64 * 1024 ** 2,
+                               seed=None, keep_weights=False):
+        # Random fully invested long-only portfolios, yielded in chunks of
+        # (annual returns, annual volatilities[, weights]). "uniform" samples
+        # the simplex uniformly; "dirichlet" concentrates (alpha < 1) or
+        # spreads (alpha > 1) the weights. Chunk size is chosen so the weight
+        # block and its W @ Sigma product (plus one temporary) fit in
+        # memory_budget bytes.
+        if method == "uniform":
+            alpha = 1.0
+        elif method != "dirichlet":
+            raise ValueError(f"Unknown sampling method '{method}'. Use 'dirichlet' or 'uniform'.")
+        pBar = np.asarray(self.pBar, dtype=float)
+        n = len(pBar)
+        chunk = max(1, int(memory_budget // (3 * 8 * n)))
+        rng = np.random.default_rng(seed)
+        for start in range(0, n_portfolios, chunk):
+            size = min(chunk, n_portfolios - start)
+            # Normalised Gamma(alpha) draws are Dirichlet(alpha) samples
+            W = rng.standard_gamma(alpha, size=(size, n))
+            W /= W.sum(axis=1, keepdims=True)
+            returns = (W @ pBar) * self.periods_per_year
+            variances = np.einsum("ij,ij->i", self._cross(W), W) * self.periods_per_year
+            volatilities = np.sqrt(np.maximum(variances, 0))
+            yield (returns, volatilities, W) if keep_weights else (returns, volatilities)
+
+    @timed("random_portfolios")
+    def random_portfolio_cloud(self, n_portfolios, max_points=5000, seed=None, **kwargs):
+        # Streams iter_random_portfolios() and keeps a uniform random sample of
+        # at most max_points (for plotting), plus the best-Sharpe draw overall.
+        rng = np.random.default_rng(None if seed is None else seed + 1)
+        kept_keys = np.empty(0)
+        kept = np.empty((0, 2))
+        best_sharpe, best_weights = -np.inf, None
+        for returns, volatilities, W in self.iter_random_portfolios(n_portfolios, seed=seed, keep_weights=True, **kwargs):
+            sharpe = (returns - self.riskFreeRate) / volatilities
+            i = int(np.argmax(sharpe))
+            if sharpe[i] > best_sharpe:
+                best_sharpe, best_weights = sharpe[i], W[i].copy()
+            # Reservoir-style sampling: keep the max_points smallest random keys
+            kept_keys = np.concatenate([kept_keys, rng.random(len(returns))])
+            kept = np.concatenate([kept, np.column_stack([returns, volatilities])])
+            if len(kept_keys) > max_points:
+                keep = np.argpartition(kept_keys, max_points)[:max_points]
+                kept_keys, kept = kept_keys[keep], kept[keep]
+        cloud = pd.DataFrame(kept, columns=["Return", "Volatility"])
+        cloud["Sharpe"] = (cloud["Return"] - self.riskFreeRate) / cloud["Volatility"]
+        cloud.attrs["best_sharpe"] = best_sharpe
+        cloud.attrs["best_weights"] = best_weights
+        return cloud
+
     def riskFunction(self, w):
-        return self.portfolio_variance(w, self.Sigma)
+        return self.portfolio_variance(w)
+
+    def constrained_solver(self, lower=0.0, upper=1.0):
+        # One solver per set of bounds, kept (with its KKT factorisation and
+        # last solution as warm start) until Sigma changes
+        key = (np.asarray(lower, dtype=float).tobytes(), np.asarray(upper, dtype=float).tobytes())
+        solver = self._solvers.get(key)
+        if solver is None:
+            Sigma = self.covariance_model if self.covariance_model is not None else self.Sigma
+            solver = self._solvers[key] = ConstrainedSolver(Sigma, self.pBar, lower, upper)
+        return solver
 
+    @timed("min_variance")
     def singleEquationSolver(self):
-        # Minimize portfolio risk without target return
-        Sigma_inv = np.linalg.inv(self.Sigma)
-        sum_all_elements = np.sum(Sigma_inv)
-        w_opt = np.sum(Sigma_inv, axis=1) / sum_all_elements
-        w_opt = np.maximum(w_opt, 0)
-        w_opt = w_opt / np.sum(w_opt)
-        return w_opt
+        # Minimize portfolio risk without target return, long-only and fully
+        # invested. Warm-started from the unconstrained solution w ~ Sigma^-1 1.
+        x = self.covariance_factor().solve(np.ones(len(self.pBar)))
+        solver = self.constrained_solver()
+        w = solver.min_variance(w0=x / np.sum(x))
+        count("qp_iterations", solver.iterations)
+        return w
 
+    def _unit_return_portfolio(self):
+        # Long-only weights with pBar'w = 1 and minimum risk, i.e. v / (pBar'v)
+        # for v = argmin 1/2 v'Sigma v - pBar'v over v >= 0 (warm-started from
+        # the unconstrained Sigma^-1 pBar). Any target U is U times this.
+        pBar = np.asarray(self.pBar, dtype=float)
+        solver = self.constrained_solver(upper=np.inf)
+        v = solver.max_return_per_risk(w0=self.covariance_factor().solve(pBar))
+        count("qp_iterations", solver.iterations)
+        M = np.dot(pBar, v)
+        if M <= 0:
+            raise ValueError("No long-only portfolio has a positive expected return.")
+        return v / M
+
+    @timed("target_return")
     def markowitz_optimal_weights_specific_return(self, U):
-        # Optimize weights for specific target daily return U
-        Sigma_inv = np.linalg.inv(self.Sigma)
-        M = np.dot(np.dot(self.pBar.T, Sigma_inv), self.pBar)
-        w_opt = np.dot(Sigma_inv, self.pBar) * (U / M)
-        w_opt = np.maximum(w_opt, 0)
-        return w_opt
-    
+        # Optimize long-only weights for specific target daily return U:
+        # min w'Sigma w s.t. pBar'w = U, w >= 0 (weights need not sum to 1).
+        return self._unit_return_portfolio() * U
+
+    def _excess_returns(self):
+        # pBar over the per-period risk-free rate (annual returns here are
+        # pBar * periods_per_year, so the rate is split the same way)
+        return np.asarray(self.pBar, dtype=float) - self.riskFreeRate / self.periods_per_year
+
+    @timed("max_sharpe")
+    def max_sharpe(self, long_only=False):
+        # Fully invested portfolio with the highest Sharpe ratio. Without
+        # bounds it is Sigma^-1 (pBar - rf) normalised to sum to 1: one solve
+        # on the cached factor. long_only=True solves the no-budget QP
+        # min 1/2 v'Sigma v - (pBar - rf)'v, v >= 0, warm-started from that
+        # solution, and rescales v the same way.
+        excess = self._excess_returns()
+        z = self.covariance_factor().solve(excess)
+        if long_only:
+            solver = self.constrained_solver(upper=np.inf)
+            z = solver.max_return_per_risk(w0=z, mu=excess)
+            count("qp_iterations", solver.iterations)
+            if not z.sum() > 0:
+                raise ValueError("No asset has an expected return above the risk-free rate.")
+        elif not z.sum() > 0:
+            # The frontier's Sharpe ratio only approaches its asymptote
+            raise ValueError("The minimum-risk portfolio does not beat the risk-free rate, so there is no tangency portfolio.")
+        return z / z.sum()
 
+    def capital_market_line(self, long_only=False, volatilities=None, num=50):
+        # Tangency portfolio plus the line through it, evaluated at the given
+        # annual volatilities (default: 0 to twice the tangency volatility)
+        weights = self.max_sharpe(long_only)
+        return_ = self.portfolioReturn(weights)
+        volatility = np.sqrt(self.riskFunction(weights))
+        sharpe = (return_ - self.riskFreeRate) / volatility
+        if volatilities is None:
+            volatilities = np.linspace(0, 2 * volatility, num)
+        volatilities = np.atleast_1d(np.asarray(volatilities, dtype=float))
+        return CapitalMarketLine(weights, return_, volatility, sharpe, volatilities,
+                                 self.riskFreeRate + sharpe * volatilities)
 
+    @timed("risk_parity")
+    def risk_parity(self, budgets=None, warm_start=None, tol=1e-10, max_iter=100):
+        # Long-only, fully invested weights whose risk contributions
+        # w_i (Sigma w)_i are proportional to budgets (equal by default).
+        # Newton's method on Spinu's convex formulation
+        #     min 1/2 y'Sigma y - sum_i b_i log y_i,   w = y / sum(y)
+        # with gradient Sigma y - b/y and Hessian Sigma + diag(b/y^2); each
+        # iteration reuses one Sigma y product. warm_start: earlier weights
+        # (e.g. from the last rebalance) to start from.
+        n = len(self.pBar)
+        b = np.full(n, 1.0 / n) if budgets is None else np.asarray(budgets, dtype=float)
+        if b.shape != (n,) or np.any(b <= 0):
+            raise ValueError("Risk budgets must be positive, one per asset.")
+        b = b / b.sum()
+        model = self.covariance_model
+        if model is not None:
+            product = model.matvec
+        else:
+            Sigma = np.asarray(self.Sigma, dtype=float)
+            product = lambda y: Sigma @ y
+
+        y = b.copy() if warm_start is None else np.maximum(np.asarray(warm_start, dtype=float), 1e-12)
+        Sy = product(y)
+        # Best multiple of the start along its ray: y'Sigma y = sum(b) = 1
+        scale = 1.0 / np.sqrt(y @ Sy)
+        y, Sy = y * scale, Sy * scale
+        for iterations in range(1, max_iter + 1):
+            gradient = Sy - b / y
+            curvature = b / y ** 2
+            if model is not None:
+                # Hessian is diag(d + b/y^2) + B B': Woodbury, O(n k^2)
+                step = LowRankFactor(model.B, model.d + curvature).solve(gradient)
+            else:
+                hessian = Sigma.copy()
+                hessian[np.diag_indices_from(hessian)] += curvature
+                step = np.linalg.solve(hessian, gradient)
+            decrement = np.sqrt(max(gradient @ step, 0.0))
+            if decrement < tol:
+                break
+            # Damped Newton step for a self-concordant objective stays in y > 0
+            y = y - step / (1.0 + decrement) if decrement > 0.25 else y - step
+            y = np.maximum(y, 1e-300)
+            Sy = product(y)
+        count("risk_parity_iterations", iterations)
+        return y / y.sum()
+
+    def risk_contributions(self, w):
+        # Per-asset decomposition of the annual volatility sigma:
+        # marginal d sigma / d w_i, contribution w_i * marginal (summing to
+        # sigma) and each asset's share of the total.
+        w = np.asarray(w, dtype=float)
+        if self.covariance_model is not None:
+            Sw = self.covariance_model.matvec(w)
+        else:
+            Sw = np.asarray(self.Sigma, dtype=float) @ w
+        volatility = np.sqrt(w @ Sw * self.periods_per_year)
+        marginal = Sw * self.periods_per_year / volatility
+        contribution = w * marginal
+        return pd.DataFrame({
+            "Weight": w,
+            "Marginal Risk": marginal,
+            "Risk Contribution": contribution,
+            "Risk Share (%)": contribution / volatility * 100,
+        }, index=self.pBar.index)
+
+    @timed("scenario_sweep")
+    def scenario_sweep(self, annual_targets, budgets):
+        # Every (annual target %, budget) pair from one QP solve: the optimal
+        # weights are linear in the target, so the whole grid is an outer
+        # product of the unit-return portfolio with the per-period targets.
+        annual_targets = np.atleast_1d(np.asarray(annual_targets, dtype=float))
+        budgets = np.atleast_1d(np.asarray(budgets, dtype=float))
+        targets = annual_to_daily_return(annual_targets, self.periods_per_year)
+        unit = self._unit_return_portfolio()
+        weights = np.outer(targets, unit)
+        unit_variance = self.riskFunction(unit)
+        sum_weights = targets * unit.sum()
+        return ScenarioSweep(
+            annual_targets,
+            budgets,
+            weights,
+            targets * self.periods_per_year,
+            targets ** 2 * unit_variance,
+            sum_weights,
+            np.outer(sum_weights, budgets),
+        )
+
+    @timed("frontier")
+    def efficient_frontier(self, targets=None, num=200, long_only=False, lower=0.0, upper=1.0):
+        # Fully invested (sum w = 1) frontier for a whole array of per-period
+        # target returns. Every frontier portfolio is a combination of
+        # Sigma^-1 1 and Sigma^-1 pBar, so two solves cover any number of targets.
+        if long_only:
+            return self._long_only_frontier(targets, num, lower, upper)
+        pBar = np.asarray(self.pBar, dtype=float)
+        X = self.covariance_factor().solve(np.column_stack([np.ones_like(pBar), pBar]))
+        a, b = X[:, 0].sum(), X[:, 1].sum()
+        c = pBar @ X[:, 1]
+        D = a * c - b * b
+        if targets is None:
+            targets = np.linspace(b / a, pBar.max(), num)
+        targets = np.atleast_1d(np.asarray(targets, dtype=float))
+
+        coefficients = np.column_stack([c - b * targets, a * targets - b]) / D
+        weights = coefficients @ X.T
+        variances = (a * targets ** 2 - 2 * b * targets + c) / D
+        return self._frontier_result(targets, weights, variances)
 
+    def _long_only_frontier(self, targets, num, lower, upper):
+        # Box-constrained frontier: one QP per target, each warm-started from
+        # the previous point. Unattainable targets get NaN rows.
+        solver = self.constrained_solver(lower, upper)
+        w_min_risk = solver.min_variance()
+        if targets is None:
+            pBar = np.asarray(self.pBar, dtype=float)
+            targets = np.linspace(pBar @ w_min_risk, _return_range(pBar, solver.lower, solver.upper)[1] @ pBar, num)
+        targets = np.atleast_1d(np.asarray(targets, dtype=float))
+        weights = np.full((len(targets), len(self.pBar)), np.nan)
+        for i in np.argsort(targets):
+            try:
+                weights[i] = solver.target_return(targets[i])
+            except ValueError:
+                continue
+        variances = np.einsum("ij,ij->i", self._cross(weights), weights)
+        return self._frontier_result(targets, weights, variances)
+
+    def _frontier_result(self, targets, weights, variances):
+        returns = targets * self.periods_per_year
+        volatilities = np.sqrt(np.maximum(variances, 0) * self.periods_per_year)
+        sharpe = (returns - self.riskFreeRate) / volatilities
+        return EfficientFrontier(targets, weights, returns, volatilities, sharpe)
+
+    @timed("allocation")
     def allocation(self, method=None, U=None, money=None):
         if method is None:
             method = self.singleEquationSolver
 
         weights = method() if U is None else method(U)
-        total_original_weight = np.sum(weights) # Calculate total of original weights
-
-        # Note: We are no longer normalizing weights to sum to 1 here.
-        # The 'Allocation (%)' will be directly based on the original weights.
-
-        allocation_df = pd.DataFrame({
-            "Original Weight": weights,
-            # "Normalized Weight": normalized_weights, # <-- إلغاء هذا العمود
-            "Allocation (%)": weights * 100, # <-- استخدام Original Weight مباشرةً
-        }, index=self.meanReturns.index)
-
-        # Calculate investment if money and target return are provided
+        investments = None
+        # Weights need not sum to 1 (target-return portfolios); money is the
+        # total to invest and is split in proportion to the weights.
         if money is not None and U is not None:
-            # When sum of weights is not 1, 'money' should be distributed based on the
-            # proportions of the 'Original Weight' relative to their sum.
-            # However, based on your previous output, 'Investment ($)' was calculated
-            # as normalized_weights * money, where normalized_weights already summed to 1.
-            # If you want to use the *original* sum of weights, you need to rethink the money allocation logic.
-            # For simplicity, if U is provided and money is the *total required investment*,
-            # then the current calculation (normalized_weights * money) still makes sense for distribution.
-            # If money is the *initial budget* and you want to proportionally allocate, it's different.
-
-            # Let's assume 'money' passed here is the total amount that *should be* invested
-            # based on the sum of original weights (e.g., investment_required from main.py)
-            # In this case, Investment ($) would be Original Weight / Total Original Weight * Money
-            # Or, if we keep the previous logic that 'money' passed is what *was* calculated as required,
-            # then we should use the `normalized_weights` to distribute it.
-            
-            # Given your previous output for 'Investment ($)' which summed to '3,301.0927',
-            # it implies 'money' here is the `investment_required` which is `sum(original_weights) * initial_budget_money`.
-            # So, to get the correct proportion for each, we still need normalization.
-            # Let's clarify this part if needed.
-
-            # For now, if the user wants `Investment ($)` to reflect the *total money available*
-            # and distribute it by these (possibly non-sum-to-1) weights, then:
-            # allocated_money = (weights / total_original_weight) * money
-            # But this would change the meaning of 'Investment ($)' from the previous output.
-
-            # Let's stick to the simpler interpretation: you want to show the 'Original Weight'
-            # as a percentage, and if money is provided, it's about how much of that money
-            # each original weight represents, relative to the sum of original weights.
-
-            allocated_money = (weights / total_original_weight) * money
-            allocation_df["Investment ($)"] = allocated_money
-        
-        # Format Allocation % to show 2 decimals + "%"
-        allocation_df["Allocation (%)"] = allocation_df["Allocation (%)"].map("{:.2f}%".format)
-
-        # Add Total row
-        total_data = {
-            "Original Weight": weights.sum(),
-            # "Normalized Weight": normalized_weights.sum(), # <-- إلغاء هذا
-            "Allocation (%)": "{:.2f}%".format(total_original_weight * 100) # <-- استخدام total_original_weight
-        }
-        if "Investment ($)" in allocation_df.columns:
-            total_data["Investment ($)"] = allocation_df["Investment ($)"].sum()
-            # total_data["Investment ($)"] = total_original_weight * money # If money is the initial budget.
-            # Based on your previous output, it was `3301.0927` which is `sum(normalized_weights) * original_money_budget`
-            # or `sum(original_weights) * original_money_budget`.
-            # If `money` passed to `allocation` is the `investment_required` then `allocation_df["Investment ($)"].sum()` is correct.
-
-        total_df = pd.DataFrame(total_data, index=["Total"])
-        allocation_df = pd.concat([allocation_df, total_df])
-
-        return allocation_df
+            investments = weights / np.sum(weights) * money
+        return AllocationResult(self.meanReturns.index.to_numpy(), weights, investments)
 
 
 
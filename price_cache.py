@@ -0,0 +1,200 @@
+import os
+import tempfile
+import threading
+import numpy as np
+import pandas as pd
+
+
+def _merge_ranges(ranges):
+    merged = []
+    for lo, hi in sorted(ranges):
+        if merged and lo <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], hi))
+        else:
+            merged.append((lo, hi))
+    return merged
+
+
+# Local on-disk price store: one pickle per ticker holding its adjusted close
+# series plus the [start, end) windows that have already been fetched, so an
+# overlapping request only goes to the network for the dates it is missing.
+# Adjusted closes are re-based by the data vendor whenever a dividend or split
+# goes ex, so each gap is fetched together with one bar the cache already
+# holds; if that bar moved, the cached history is rescaled to the new basis
+# before the two pieces are joined.
+class PriceCache:
+    def __init__(self, root=None):
+        self.root = root or os.environ.get("PRICE_CACHE_DIR", ".price_cache")
+        self.hits = 0
+        self.misses = 0
+        self._entries = {}
+        self._lock = threading.Lock()
+        self._inflight = {}  # ticker -> Event set when its fetch is stored
+
+    def _path(self, ticker):
+        return os.path.join(self.root, f"{ticker}.pkl")
+
+    def _entry(self, ticker):
+        entry = self._entries.get(ticker)
+        if entry is None:
+            path = self._path(ticker)
+            if os.path.exists(path):
+                entry = pd.read_pickle(path)
+            else:
+                entry = {"prices": pd.Series(dtype=float, index=pd.DatetimeIndex([]), name=ticker), "ranges": []}
+            self._entries[ticker] = entry
+        return entry
+
+    def _save(self, ticker, entry):
+        # Unique temp file per write: other processes (service workers, a
+        # batch run) may be saving the same ticker into the same root. The
+        # last complete write wins; a reader never sees a partial pickle.
+        os.makedirs(self.root, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=self.root, prefix=f"{ticker}.", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                pd.to_pickle(entry, f)
+            os.replace(tmp, self._path(ticker))
+        except BaseException:
+            os.unlink(tmp)
+            raise
+
+    def missing_ranges(self, ticker, start, end):
+        start, end = pd.Timestamp(start), pd.Timestamp(end)
+        gaps = []
+        cursor = start
+        for lo, hi in self._entry(ticker)["ranges"]:
+            if hi <= cursor:
+                continue
+            if lo >= end:
+                break
+            if lo > cursor:
+                gaps.append((cursor, lo))
+            cursor = max(cursor, hi)
+            if cursor >= end:
+                break
+        if cursor < end:
+            gaps.append((cursor, end))
+        return gaps
+
+    def _fetch_window(self, ticker, start, end, reach=pd.Timedelta(days=10)):
+        # The gap widened to include the adjacent cached bar on one side (a
+        # gap with no cached bar within reach has no seam to re-base)
+        cached = self._entry(ticker)["prices"]
+        before = cached.index[(cached.index < start) & (cached.index >= start - reach)]
+        if len(before):
+            return before[-1], end
+        after = cached.index[(cached.index >= end) & (cached.index < end + reach)]
+        if len(after):
+            return start, after[0] + pd.Timedelta(days=1)
+        return start, end
+
+    def store(self, ticker, prices, start, end):
+        # prices may overlap the cached series: the shared bars give the
+        # factor between the old and the new adjustment basis.
+        entry = self._entry(ticker)
+        start = pd.Timestamp(start)
+        # Never mark today or the future as covered: those bars are still moving.
+        end = min(pd.Timestamp(end), pd.Timestamp.today().normalize())
+        prices = prices.dropna().astype(float)
+        shared = entry["prices"].index.intersection(prices.index)
+        if len(shared):
+            ratio = float((prices[shared] / entry["prices"][shared]).median())
+            if np.isfinite(ratio) and ratio > 0 and abs(ratio - 1) > 1e-9:
+                entry["prices"] = entry["prices"] * ratio
+        combined = pd.concat([entry["prices"], prices])
+        combined = combined[~combined.index.duplicated(keep="last")].sort_index()
+        combined.name = ticker
+        entry["prices"] = combined
+        if start < end:
+            entry["ranges"] = _merge_ranges(entry["ranges"] + [(start, end)])
+        self._save(ticker, entry)
+
+    def get(self, tickers, start, end, fetch):
+        # fetch(tickers, start, end) -> DataFrame of adjusted closes (one column
+        # per ticker it could fetch) or None when the whole request failed.
+        # The lock only guards the in-memory entries: gaps are worked out and
+        # results stored under it, the network calls run outside it. A ticker
+        # already being fetched by another caller is waited for, not fetched
+        # twice; each ticker is fetched at most once per call.
+        if isinstance(tickers, str):
+            tickers = [tickers]
+        start, end = pd.Timestamp(start), pd.Timestamp(end)
+        attempted = set()
+        first_pass = True
+        while True:
+            pending, claimed, waiting = {}, [], []
+            with self._lock:
+                for ticker in tickers:
+                    gaps = self.missing_ranges(ticker, start, end)
+                    if first_pass:
+                        if gaps:
+                            self.misses += 1
+                        else:
+                            self.hits += 1
+                    # Gaps without a single business day need no request
+                    gaps = [gap for gap in gaps if len(pd.bdate_range(gap[0], gap[1], inclusive="left"))]
+                    if not gaps or ticker in attempted:
+                        continue
+                    if ticker in self._inflight:
+                        waiting.append(self._inflight[ticker])
+                        continue
+                    self._inflight[ticker] = threading.Event()
+                    claimed.append(ticker)
+                    for gap in gaps:
+                        window = self._fetch_window(ticker, *gap)
+                        pending.setdefault((window, gap), []).append(ticker)
+            first_pass = False
+            attempted.update(claimed)
+
+            try:
+                # Tickers sharing the same window are fetched in one batch.
+                for ((fetch_start, fetch_end), (gap_start, gap_end)), group in pending.items():
+                    fetched = fetch(group, fetch_start.strftime("%Y-%m-%d"), fetch_end.strftime("%Y-%m-%d"))
+                    if fetched is None:
+                        continue
+                    if isinstance(fetched, pd.Series):
+                        fetched = fetched.to_frame(name=group[0])
+                    with self._lock:
+                        for ticker in group:
+                            if ticker in fetched.columns:
+                                self.store(ticker, fetched[ticker], gap_start, gap_end)
+            finally:
+                with self._lock:
+                    for ticker in claimed:
+                        self._inflight.pop(ticker).set()
+            if not waiting:
+                break
+            for event in waiting:
+                event.wait()
+
+        with self._lock:
+            columns = {}
+            for ticker in tickers:
+                series = self._entry(ticker)["prices"]
+                series = series[(series.index >= start) & (series.index < end)]
+                if not series.empty:
+                    columns[ticker] = series
+        if not columns:
+            return None
+        frame = pd.DataFrame(columns)
+        frame.index.name = "Date"
+        return frame[sorted(frame.columns)]
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+            if os.path.isdir(self.root):
+                for name in os.listdir(self.root):
+                    if name.endswith(".pkl"):
+                        os.remove(os.path.join(self.root, name))
@@ -0,0 +1,114 @@
+import json
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+import pandas as pd
+
+
+# Per-ticker price fetchers. A fetcher is any callable
+#     fetcher(ticker, start, end) -> pd.Series of adjusted closes
+# that raises on failure; fetch_prices() runs one per ticker in parallel.
+# A request that succeeded but has no bars in the window (a weekend, a
+# holiday) raises NoPricesError instead: it is not retried and comes back as
+# an empty series, so callers can tell "nothing traded" from "fetch failed".
+
+
+class NoPricesError(ValueError):
+    pass
+
+
+def yfinance_fetcher(ticker, start, end):
+    import yfinance as yf
+
+    data = yf.download(tickers=ticker, start=start, end=end, auto_adjust=False, progress=False)
+    prices = data["Adj Close"]
+    if isinstance(prices, pd.DataFrame):
+        prices = prices.iloc[:, 0]
+    prices = prices.dropna()
+    if prices.empty:
+        # yfinance reports network errors per ticker instead of raising
+        if ticker in getattr(getattr(yf, "shared", None), "_ERRORS", {}):
+            raise ValueError(f"No prices returned for {ticker}")
+        raise NoPricesError(f"No prices for {ticker} between {start} and {end}")
+    return prices.rename(ticker)
+
+
+# Fetches from a Yahoo-compatible chart endpoint:
+#     GET {base_url}/v8/finance/chart/{ticker}?period1=..&period2=..&interval=1d
+# base_url (and the urllib opener) can point at a local stand-in server.
+# urllib is imported here rather than at module level: the HTTP stack is only
+# paid for by callers that actually use this fetcher.
+class YahooChartFetcher:
+    def __init__(self, base_url="https://query1.finance.yahoo.com", timeout=10, opener=None):
+        import urllib.request
+
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self.opener = opener or urllib.request.build_opener()
+
+    def url(self, ticker, start, end):
+        import urllib.parse
+
+        query = urllib.parse.urlencode({
+            "period1": int(pd.Timestamp(start).timestamp()),
+            "period2": int(pd.Timestamp(end).timestamp()),
+            "interval": "1d",
+            "events": "div,splits",
+        })
+        return f"{self.base_url}/v8/finance/chart/{urllib.parse.quote(ticker)}?{query}"
+
+    def __call__(self, ticker, start, end):
+        import urllib.request
+
+        request = urllib.request.Request(self.url(ticker, start, end), headers={"User-Agent": "Mozilla/5.0"})
+        with self.opener.open(request, timeout=self.timeout) as response:
+            payload = json.load(response)
+        result = payload["chart"]["result"][0]
+        timestamps = result.get("timestamp") or []
+        indicators = result["indicators"]
+        closes = (indicators.get("adjclose") or indicators["quote"])[0]
+        closes = closes.get("adjclose", closes.get("close"))
+        index = pd.to_datetime(timestamps, unit="s").normalize()
+        prices = pd.Series(closes, index=index, name=ticker, dtype=float).dropna()
+        prices = prices[(prices.index >= pd.Timestamp(start)) & (prices.index < pd.Timestamp(end))]
+        if prices.empty:
+            raise NoPricesError(f"No prices for {ticker} between {start} and {end}")
+        return prices
+
+
+def _fetch_with_backoff(fetcher, ticker, start, end, retries, base_delay, max_delay, sleep):
+    for attempt in range(retries):
+        try:
+            return fetcher(ticker, start, end)
+        except NoPricesError:
+            return pd.Series(dtype=float, index=pd.DatetimeIndex([]), name=ticker)
+        except Exception as e:
+            if attempt == retries - 1:
+                raise
+            # Exponential backoff with jitter, per ticker
+            delay = min(max_delay, base_delay * 2 ** attempt) * random.uniform(0.5, 1.0)
+            print(f"Download of {ticker} failed: {e}. Retrying in {delay:.1f} seconds...")
+            sleep(delay)
+
+
+def fetch_prices(tickers, start, end, fetcher=None, max_workers=8, retries=3, base_delay=0.5, max_delay=8.0, sleep=time.sleep):
+    # Returns (DataFrame with one column per ticker that succeeded, all-NaN
+    #          for tickers with no bars in the window,
+    #          {ticker: exception} for the ones that did not).
+    if isinstance(tickers, str):
+        tickers = [tickers]
+    fetcher = fetcher or yfinance_fetcher
+    prices, failed = {}, {}
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(tickers)))) as pool:
+        futures = {
+            ticker: pool.submit(_fetch_with_backoff, fetcher, ticker, start, end, retries, base_delay, max_delay, sleep)
+            for ticker in tickers
+        }
+        for ticker, future in futures.items():
+            try:
+                prices[ticker] = future.result()
+            except Exception as e:
+                failed[ticker] = e
+    frame = pd.DataFrame(prices) if prices else pd.DataFrame()
+    frame.index.name = "Date"
+    return frame, failed
@@ -0,0 +1,96 @@
+from collections import deque
+import numpy as np
+
+
+# Running mean and covariance of return rows, updated in O(n^2) per bar.
+#   window=None      every bar ever added (Welford)
+#   window=k         sliding window over the last k bars (Welford add/remove)
+#   halflife=h       exponentially weighted, h bars half-life
+class RunningMoments:
+    def __init__(self, n_assets, window=None, halflife=None):
+        if window is not None and halflife is not None:
+            raise ValueError("Use either a sliding window or a halflife, not both.")
+        if window is not None and window < 2:
+            raise ValueError("Sliding window needs at least 2 bars.")
+        self.n_assets = n_assets
+        self.window = window
+        self.alpha = None if halflife is None else 1.0 - 0.5 ** (1.0 / halflife)
+        self.count = 0
+        self._mean = np.zeros(n_assets)
+        self._comoment = np.zeros((n_assets, n_assets))
+        self._rows = deque() if window is not None else None
+
+    @classmethod
+    def from_returns(cls, returns, window=None, halflife=None):
+        # Seed from a history in one vectorised pass instead of bar by bar.
+        returns = np.asarray(returns, dtype=float)
+        moments = cls(returns.shape[1], window, halflife)
+        if window is not None:
+            returns = returns[-window:]
+            moments._rows.extend(returns)
+        moments.count = len(returns)
+        if moments.count == 0:
+            return moments
+        if moments.alpha is None:
+            moments._mean = returns.mean(axis=0)
+            centered = returns - moments._mean
+            moments._comoment = centered.T @ centered
+        else:
+            weights = (1.0 - moments.alpha) ** np.arange(len(returns) - 1, -1, -1)
+            weights /= weights.sum()
+            moments._mean = weights @ returns
+            centered = returns - moments._mean
+            moments._comoment = (centered * weights[:, None]).T @ centered
+        return moments
+
+    def add(self, x):
+        x = np.asarray(x, dtype=float)
+        if self.alpha is not None:
+            if self.count == 0:
+                self._mean = x.copy()
+            else:
+                delta = x - self._mean
+                self._mean += self.alpha * delta
+                self._comoment = (1.0 - self.alpha) * (self._comoment + self.alpha * np.outer(delta, delta))
+            self.count += 1
+            return
+        self.count += 1
+        delta = x - self._mean
+        self._mean += delta / self.count
+        self._comoment += np.outer(delta, x - self._mean)
+        if self._rows is not None:
+            self._rows.append(x)
+            if len(self._rows) > self.window:
+                self.remove(self._rows.popleft())
+
+    def remove(self, x):
+        # Exact inverse of add() for the equal-weighted estimators.
+        if self.alpha is not None:
+            raise ValueError("Bars cannot be removed from an exponentially weighted estimate.")
+        x = np.asarray(x, dtype=float)
+        if self.count <= 1:
+            self.count = 0
+            self._mean[:] = 0.0
+            self._comoment[:] = 0.0
+            return
+        mean_before = self._mean.copy()
+        self.count -= 1
+        self._mean = (self._mean * (self.count + 1) - x) / self.count
+        self._comoment -= np.outer(x - self._mean, x - mean_before)
+
+    def update(self, rows):
+        for x in np.atleast_2d(rows):
+            self.add(x)
+
+    @property
+    def mean(self):
+        return self._mean.copy()
+
+    @property
+    def cov(self):
+        # Sample covariance (ddof=1), matching DataFrame.cov()
+        if self.alpha is not None:
+            return self._comoment.copy()
+        if self.count < 2:
+            return np.full((self.n_assets, self.n_assets), np.nan)
+        return self._comoment / (self.count - 1)
@@ -0,0 +1,327 @@
+import argparse
+import asyncio
+import json
+import zlib
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from urllib.parse import parse_qs, urlsplit
+import numpy as np
+import pandas as pd
+
+from optimizer_registry import SharedCache, optimizer_nbytes
+from portfolio_optimizer import PortfolioOptimizer, annual_to_daily_return, load_prices
+
+
+# Small asyncio HTTP/JSON service in front of PortfolioOptimizer, for other
+# services that need allocations without going through Streamlit.
+#
+#   python service.py --port 8080 [--processes 4] [--stub]
+#
+#   GET|POST /min-risk       tickers, start, end[, budget]
+#   GET|POST /target-return  tickers, start, end, target_return (annual %)[, budget]
+#   GET|POST /frontier       tickers, start, end[, num, long_only]
+#   GET|POST /metrics        tickers, start, end
+#   GET      /stats          cache and coalescing counters
+#
+# Parameters come from the query string (tickers=AAPL,JNJ,PG) or a JSON body.
+# Solves run in a worker pool; identical requests in flight share one
+# computation and finished responses are cached for `ttl` seconds.
+
+ENDPOINTS = ("min-risk", "target-return", "frontier", "metrics")
+
+_REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed", 500: "Internal Server Error"}
+
+_worker = {}
+
+
+# Price source for tests and local runs: deterministic random-walk prices per
+# ticker (the same ticker always gets the same path), no network or Excel.
+class StubPriceSource:
+    def __init__(self, seed=0):
+        self.seed = seed
+
+    def __call__(self, tickers, start, end):
+        index = pd.bdate_range(start, end, inclusive="left")
+        columns = {}
+        for ticker in tickers:
+            rng = np.random.default_rng([self.seed, zlib.crc32(ticker.encode())])
+            drift, vol = rng.uniform(-1e-4, 8e-4), rng.uniform(0.008, 0.025)
+            columns[ticker] = 100 * np.exp(np.cumsum(rng.normal(drift, vol, len(index))))
+        prices = pd.DataFrame(columns, index=index)
+        prices.index.name = "Date"
+        return prices
+
+
+class ExcelBackedPriceSource:
+    def __init__(self, excel_file="stock_data.xlsx"):
+        self.excel_file = excel_file
+
+    def __call__(self, tickers, start, end):
+        return load_prices(list(tickers), start, end, self.excel_file)
+
+
+def _worker_state(price_source, riskFreeRate):
+    return {
+        "price_source": price_source,
+        "riskFreeRate": riskFreeRate,
+        "optimizers": SharedCache(max_entries=16, max_bytes=256 * 1024 ** 2, ttl=3600, sizeof=optimizer_nbytes),
+    }
+
+
+def _init_worker(price_source, riskFreeRate):
+    # Pool initializer for process mode; thread mode keeps the state on the
+    # service instead, so two services in one process stay independent.
+    _worker.update(_worker_state(price_source, riskFreeRate))
+
+
+def _optimizer(state, tickers, start, end):
+    def build():
+        prices = state["price_source"](tickers, start, end)
+        if prices is not None:
+            prices = prices.dropna(axis=1, how="all")
+        if prices is None or prices.empty:
+            raise ValueError("No price data for the requested universe and window.")
+        if len(prices) < 3:
+            # Two returns are the least a covariance can be estimated from
+            raise ValueError("The window has fewer than 3 price bars; pick a longer one.")
+        missing = [t for t in tickers if t not in prices.columns]
+        if missing:
+            raise ValueError(f"No price data for {', '.join(missing)}")
+        return PortfolioOptimizer.from_prices(prices[list(tickers)], riskFreeRate=state["riskFreeRate"])
+    return state["optimizers"].get_or_create((tickers, start, end), build)
+
+
+def _json_floats(values):
+    # NaN and infinity (e.g. unattainable long-only frontier targets) are not
+    # valid JSON; they become null
+    values = np.asarray(values, dtype=float)
+    result = values.astype(object)
+    result[~np.isfinite(values)] = None
+    return result.tolist()
+
+
+def _allocation_payload(optimizer, weights, budget):
+    payload = {
+        "tickers": list(optimizer.pBar.index),
+        "weights": weights.tolist(),
+        "sum_weights": float(weights.sum()),
+        "expected_return": float(optimizer.portfolioReturn(weights)),
+        "risk": float(optimizer.riskFunction(weights)),
+    }
+    if budget is not None:
+        payload["investments"] = (weights * budget).tolist()
+        payload["investment_required"] = float(weights.sum() * budget)
+    return payload
+
+
+def compute(endpoint, params, state=None):
+    # Runs in a pool worker; params is the normalised request (see
+    # parse_params), state defaults to the worker process's
+    state = _worker if state is None else state
+    optimizer = _optimizer(state, params["tickers"], params["start"], params["end"])
+    if endpoint == "min-risk":
+        return _allocation_payload(optimizer, optimizer.singleEquationSolver(), params.get("budget"))
+    if endpoint == "target-return":
+        weights = optimizer.markowitz_optimal_weights_specific_return(
+            annual_to_daily_return(params["target_return"], optimizer.periods_per_year))
+        return _allocation_payload(optimizer, weights, params.get("budget"))
+    if endpoint == "frontier":
+        frontier = optimizer.efficient_frontier(num=params.get("num", 100), long_only=params.get("long_only", False))
+        return {
+            "tickers": list(optimizer.pBar.index),
+            "returns": _json_floats(frontier.returns),
+            "volatilities": _json_floats(frontier.volatilities),
+            "sharpe": _json_floats(frontier.sharpe),
+            "weights": _json_floats(frontier.weights),
+        }
+    equal_weight = _json_floats(optimizer.calculate_metrics())
+    return {
+        "tickers": list(optimizer.pBar.index),
+        "annual_returns": _json_floats(optimizer.pBar * optimizer.periods_per_year),
+        "annual_volatilities": _json_floats(np.sqrt(optimizer.variances() * optimizer.periods_per_year)),
+        "equal_weight": dict(zip(["annual_return", "volatility", "variance", "sharpe"], equal_weight)),
+    }
+
+
+def parse_params(endpoint, params):
+    # Validates and normalises request parameters; the result (as a sorted
+    # tuple of items) is also the coalescing/cache key.
+    tickers = params.get("tickers")
+    if isinstance(tickers, str):
+        tickers = tickers.replace(",", " ").split()
+    if not tickers:
+        raise ValueError("'tickers' is required")
+    if not params.get("start") or not params.get("end"):
+        raise ValueError("'start' and 'end' are required")
+    start, end = pd.Timestamp(params["start"]), pd.Timestamp(params["end"])
+    if start >= end:
+        raise ValueError("'start' must be before 'end'")
+    normalised = {
+        "tickers": tuple(dict.fromkeys(str(t).upper() for t in tickers)),
+        "start": str(start.date()),
+        "end": str(end.date()),
+    }
+    if params.get("budget") is not None:
+        normalised["budget"] = float(params["budget"])
+    if endpoint == "target-return":
+        if params.get("target_return") is None:
+            raise ValueError("'target_return' is required")
+        normalised["target_return"] = float(params["target_return"])
+    elif endpoint == "frontier":
+        normalised["num"] = min(int(params.get("num", 100)), 1000)
+        normalised["long_only"] = str(params.get("long_only", False)).lower() in ("1", "true", "yes")
+    return normalised
+
+
+class OptimizerService:
+    def __init__(self, price_source=None, riskFreeRate=0.044, executor=None, processes=0, threads=4,
+                 cache_entries=4096, ttl=300):
+        # With processes > 0 every worker process keeps its own optimizers;
+        # otherwise solves run on threads sharing one set.
+        self.price_source = price_source or ExcelBackedPriceSource()
+        self._state = None
+        if executor is None and processes:
+            executor = ProcessPoolExecutor(processes, initializer=_init_worker, initargs=(self.price_source, riskFreeRate))
+        elif not isinstance(executor, ProcessPoolExecutor):
+            self._state = _worker_state(self.price_source, riskFreeRate)
+            executor = executor or ThreadPoolExecutor(threads)
+        self.executor = executor
+        self.responses = SharedCache(max_entries=cache_entries, ttl=ttl, sizeof=len)
+        self.requests = 0
+        self.computations = 0
+        self.coalesced = 0
+        self._inflight = {}
+
+    async def handle(self, endpoint, params):
+        # Returns (status, JSON bytes)
+        if endpoint == "stats":
+            return 200, json.dumps(self.stats()).encode()
+        if endpoint not in ENDPOINTS:
+            return 404, json.dumps({"error": f"Unknown endpoint '/{endpoint}'"}).encode()
+        self.requests += 1
+        try:
+            params = parse_params(endpoint, params)
+        except (TypeError, ValueError) as e:
+            return 400, json.dumps({"error": str(e)}).encode()
+
+        key = (endpoint, tuple(sorted(params.items())))
+        cached = self.responses.get(key)
+        if cached is not None:
+            return 200, cached
+        future = self._inflight.get(key)
+        if future is not None:
+            self.coalesced += 1
+            return await asyncio.shield(future)
+
+        loop = asyncio.get_running_loop()
+        future = self._inflight[key] = loop.create_future()
+        result = (500, json.dumps({"error": "Request cancelled"}).encode())
+        try:
+            self.computations += 1
+            payload = await loop.run_in_executor(self.executor, compute, endpoint, params, self._state)
+            body = json.dumps(payload, allow_nan=False).encode()
+            self.responses.put(key, body)
+            result = (200, body)
+        except (KeyError, ValueError, np.linalg.LinAlgError) as e:
+            result = (400, json.dumps({"error": str(e)}).encode())
+        except Exception as e:
+            result = (500, json.dumps({"error": f"{type(e).__name__}: {e}"}).encode())
+        finally:
+            # Waiters get the result even if this request's own task is cancelled
+            del self._inflight[key]
+            future.set_result(result)
+        return result
+
+    def stats(self):
+        return {
+            "requests": self.requests,
+            "computations": self.computations,
+            "coalesced": self.coalesced,
+            "in_flight": len(self._inflight),
+            "responses": self.responses.stats(),
+        }
+
+    async def _serve_connection(self, reader, writer):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                method, target, version = request_line.decode("latin-1").split()
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                body = await reader.readexactly(int(headers.get("content-length", 0)))
+
+                url = urlsplit(target)
+                params = {name: values[-1] for name, values in parse_qs(url.query).items()}
+                if method == "POST" and body:
+                    try:
+                        fields = json.loads(body)
+                    except json.JSONDecodeError as e:
+                        fields = None
+                        status, payload = 400, json.dumps({"error": f"Invalid JSON body: {e}"}).encode()
+                    else:
+                        if not isinstance(fields, dict):
+                            fields = None
+                            status, payload = 400, json.dumps({"error": "JSON body must be an object"}).encode()
+                    if fields is not None:
+                        params.update(fields)
+                        status, payload = await self.handle(url.path.strip("/"), params)
+                elif method in ("GET", "POST"):
+                    status, payload = await self.handle(url.path.strip("/"), params)
+                else:
+                    status, payload = 405, json.dumps({"error": f"Method {method} not allowed"}).encode()
+
+                keep_alive = headers.get("connection", "").lower() != "close" and version == "HTTP/1.1"
+                writer.write(
+                    f"HTTP/1.1 {status} {_REASONS[status]}\r\n"
+                    "Content-Type: application/json\r\n"
+                    f"Content-Length: {len(payload)}\r\n"
+                    f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode("latin-1") + payload
+                )
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ValueError, asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, host="127.0.0.1", port=8080):
+        server = await asyncio.start_server(self._serve_connection, host, port)
+        print(f"Serving on {', '.join(str(s.getsockname()) for s in server.sockets)}")
+        async with server:
+            await server.serve_forever()
+
+    def close(self):
+        self.executor.shutdown()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="HTTP/JSON optimizer service")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--processes", type=int, default=0, help="worker processes (0: threads in this process)")
+    parser.add_argument("--threads", type=int, default=4)
+    parser.add_argument("--excel", default="stock_data.xlsx", help="Excel backup used when downloads fail")
+    parser.add_argument("--risk-free", type=float, default=0.044)
+    parser.add_argument("--ttl", type=float, default=300, help="seconds a response stays cached")
+    parser.add_argument("--stub", action="store_true", help="serve synthetic prices (no network, no Excel)")
+    args = parser.parse_args(argv)
+
+    price_source = StubPriceSource() if args.stub else ExcelBackedPriceSource(args.excel)
+    service = OptimizerService(price_source, args.risk_free, processes=args.processes, threads=args.threads, ttl=args.ttl)
+    try:
+        asyncio.run(service.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        service.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+import asyncio
+import os
+from collections import namedtuple
+import numpy as np
+import pandas as pd
+
+from columnar_prices import load_prices as load_store_prices
+from rolling_stats import RunningMoments
+
+
+# Live monitoring of an optimized portfolio. A price feed is any async
+# iterable of Tick(timestamp, {ticker: price}) - a full bar or just the
+# tickers that traded. LivePortfolioMonitor keeps the holdings fixed between
+# rebalances and updates P&L, realized volatility and drift from the target
+# weights in O(n) per tick, without touching the PortfolioOptimizer.
+# Realized volatility is measured on bars (one return per trading day by
+# default, whatever the tick rate), so it annualizes with periods_per_year.
+#
+#     monitor = LivePortfolioMonitor.from_optimizer(optimizer, weights, budget=10000)
+#     async for state in monitor.stream(replay_file("ticks.csv")):
+#         if state.signal is not None: ...
+
+Tick = namedtuple("Tick", ["timestamp", "prices"])
+
+MonitorState = namedtuple("MonitorState", ["timestamp", "value", "pnl", "pnl_pct", "realized_vol", "drift", "signal"])
+
+# Emitted when drift crosses the threshold; trades are the money to buy (+)
+# or sell (-) per ticker to get back to the target weights.
+RebalanceSignal = namedtuple("RebalanceSignal", ["timestamp", "drift", "trades"])
+
+# Pandas period alias of one bar for each optimizer frequency
+BARS = {"daily": "D", "weekly": "W-FRI", "monthly": "M"}
+
+
+async def replay_frame(prices, delay=0.0):
+    # Replays a price frame (dates x tickers) bar by bar; delay seconds
+    # between bars (0 still yields to the event loop).
+    columns = list(prices.columns)
+    for timestamp, row in zip(prices.index, prices.to_numpy(dtype=float)):
+        valid = ~np.isnan(row)
+        yield Tick(timestamp, {t: p for t, p, ok in zip(columns, row, valid) if ok})
+        await asyncio.sleep(delay)
+
+
+async def replay_ticks(ticks, delay=0.0):
+    # Replays long-format ticks (timestamp, ticker, price), one Tick per row
+    for timestamp, ticker, price in ticks[["timestamp", "ticker", "price"]].itertuples(index=False):
+        yield Tick(pd.Timestamp(timestamp), {ticker: float(price)})
+        await asyncio.sleep(delay)
+
+
+def replay_file(path, delay=0.0, tickers=None, start=None, end=None):
+    # Replayable local source for tests and demos:
+    #   *.npystore directory          bars from the columnar price store
+    #   CSV/Parquet with ticker,price  individual ticks (timestamp column)
+    #   any other CSV/Parquet          bars, dates in the first column
+    if os.path.isdir(path):
+        return replay_frame(load_store_prices(path, tickers, start, end), delay)
+    if path.endswith(".parquet"):
+        data = pd.read_parquet(path)
+    else:
+        data = pd.read_csv(path)
+    if {"ticker", "price"} <= set(data.columns):
+        data = data.sort_values("timestamp", kind="stable")
+        if tickers is not None:
+            data = data[data["ticker"].isin(tickers)]
+        return replay_ticks(data, delay)
+    data = data.set_index(data.columns[0])
+    data.index = pd.to_datetime(data.index)
+    if tickers is not None:
+        data = data[list(tickers)]
+    return replay_frame(data.loc[start:end] if start or end else data, delay)
+
+
+class LivePortfolioMonitor:
+    def __init__(self, tickers, target_weights, entry_prices, budget=1.0, drift_threshold=0.05,
+                 vol_window=None, vol_halflife=None, periods_per_year=252, bar="D"):
+        # target_weights: optimizer weights (need not sum to 1); money per
+        # ticker is weight * budget, bought at entry_prices. drift is the
+        # largest absolute gap between the current and the target weights
+        # (both as fractions of the invested value). bar is the period alias
+        # the volatility is sampled at and must match periods_per_year;
+        # vol_window / vol_halflife count bars.
+        self.tickers = list(tickers)
+        self._column = {t: i for i, t in enumerate(self.tickers)}
+        self.target_weights = np.asarray(target_weights, dtype=float)
+        self.budget = budget
+        self.drift_threshold = drift_threshold
+        self.periods_per_year = periods_per_year
+        self.bar = bar
+        self.prices = np.asarray(entry_prices, dtype=float).copy()
+        self._moments = RunningMoments(1, vol_window, vol_halflife)
+        self._bar = None
+        self._bar_open = None
+        self._signalled = False
+        self.timestamp = None
+        self.rebalance()
+        self.cost = self.value
+
+    @classmethod
+    def from_optimizer(cls, optimizer, weights, budget=1.0, entry_prices=None, **kwargs):
+        # Entry prices default to the optimizer's last price bar
+        if entry_prices is None:
+            entry_prices = optimizer.prices.iloc[-1].to_numpy(dtype=float)
+        kwargs.setdefault("bar", BARS[optimizer.frequency])
+        return cls(list(optimizer.pBar.index), weights, entry_prices, budget,
+                   periods_per_year=optimizer.periods_per_year, **kwargs)
+
+    def rebalance(self):
+        # Trade back to the target weights at the current prices, keeping the
+        # current portfolio value (the whole budget on the first call)
+        value = self.budget * self.target_weights.sum() if self.timestamp is None else self.value
+        self.target_fractions = self.target_weights / self.target_weights.sum()
+        self.shares = value * self.target_fractions / self.prices
+        self.value = float(self.shares @ self.prices)
+        self._signalled = False
+
+    def update(self, timestamp, prices):
+        # prices: {ticker: price} for the tickers that moved; others keep
+        # their last price. Returns the MonitorState after this tick. Ticks
+        # that move no monitored ticker leave the bars (and so the realized
+        # volatility) alone.
+        self.timestamp = timestamp
+        moved = [(self._column[t], p) for t, p in prices.items() if t in self._column and p > 0]
+        if moved:
+            bar = pd.Timestamp(timestamp).to_period(self.bar)
+            if self._bar is None:
+                self._bar, self._bar_open = bar, self.value
+            elif bar != self._bar:
+                # First tick of a new bar: the previous one closed at the
+                # current value, which is one return sample
+                self._moments.add([np.log(self.value / self._bar_open)])
+                self._bar, self._bar_open = bar, self.value
+            for column, price in moved:
+                self.prices[column] = price
+            self.value = float(self.shares @ self.prices)
+
+        holdings = self.shares * self.prices
+        drift = float(np.max(np.abs(holdings / self.value - self.target_fractions)))
+        signal = None
+        if drift > self.drift_threshold and not self._signalled:
+            # One signal per excursion: re-armed by rebalance() or once the
+            # drift is back under the threshold
+            signal = RebalanceSignal(timestamp, drift, dict(zip(self.tickers, self.value * self.target_fractions - holdings)))
+            self._signalled = True
+        elif drift <= self.drift_threshold:
+            self._signalled = False
+        return MonitorState(timestamp, self.value, self.value - self.cost, self.value / self.cost - 1,
+                            self.realized_vol, drift, signal)
+
+    @property
+    def realized_vol(self):
+        # Annualized volatility of the per-bar portfolio log returns; the bar
+        # in progress is counted once the next one starts
+        if self._moments.count < 2:
+            return np.nan
+        return float(np.sqrt(self._moments.cov[0, 0] * self.periods_per_year))
+
+    async def stream(self, source, auto_rebalance=False):
+        # Async generator of MonitorState, one per tick of source
+        async for tick in source:
+            state = self.update(tick.timestamp, tick.prices)
+            if auto_rebalance and state.signal is not None:
+                self.rebalance()
+            yield state
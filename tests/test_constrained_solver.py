@@ -0,0 +1,135 @@
+import os
+import sys
+import numpy as np
+import pytest
+from scipy.optimize import minimize
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from covariance import LowRankFactor
+from portfolio_optimizer import ConstrainedSolver, _return_range
+
+
+# Regression checks for the active-set QP behind the long-only strategies:
+# every solution must satisfy the KKT conditions of its problem and be at
+# least as good as SLSQP, on random box problems (finite and infinite upper
+# bounds) with dense and low-rank covariance.
+
+UPPERS = [1.0, 0.25, np.inf]
+
+
+def random_problem(n, seed):
+    rng = np.random.default_rng(seed)
+    B = rng.normal(scale=0.01, size=(n, max(2, n // 8)))
+    d = rng.uniform(1e-5, 4e-4, n)
+    mu = rng.normal(4e-4, 4e-4, n)
+    return B, d, mu
+
+
+def covariances(B, d):
+    model = LowRankFactor(B, d)
+    return {"dense": model.to_dense(), "low_rank": model}
+
+
+def assert_kkt(Sigma, w, g, lower, upper, equalities, tol=1e-8):
+    # g: gradient of the objective at w; equalities: (k x n) rows whose
+    # multipliers are fitted on the free assets. Free assets must be
+    # stationary and pinned ones must have sign-correct multipliers.
+    assert np.all(w >= lower - 1e-12) and np.all(w <= upper + 1e-12)
+    scale = np.abs(g).max() + np.abs(np.diag(Sigma)).max()
+    at_lower = w <= lower + 1e-12
+    at_upper = w >= upper - 1e-12
+    free = ~(at_lower | at_upper)
+    residual = g.copy()
+    if len(equalities):
+        A = np.atleast_2d(equalities)
+        nu = np.linalg.lstsq(A[:, free].T, -g[free], rcond=None)[0] if free.any() else np.zeros(len(A))
+        residual = g + A.T @ nu
+    assert np.abs(residual[free]).max(initial=0.0) <= tol * scale
+    assert residual[at_lower & ~at_upper].min(initial=0.0) >= -tol * scale
+    assert residual[at_upper & ~at_lower].max(initial=0.0) <= tol * scale
+
+
+def slsqp(Sigma, mu, upper, target=None):
+    n = len(mu)
+    constraints = [{"type": "eq", "fun": lambda w: w.sum() - 1, "jac": lambda w: np.ones(n)}]
+    if target is not None:
+        constraints.append({"type": "eq", "fun": lambda w: (mu @ w - target) * 1e4, "jac": lambda w: mu * 1e4})
+    result = minimize(lambda w: w @ Sigma @ w * 1e4, np.full(n, 1.0 / n), jac=lambda w: 2e4 * Sigma @ w,
+                      method="SLSQP", bounds=[(0.0, None if np.isinf(upper) else upper)] * n,
+                      constraints=constraints, options={"ftol": 1e-14, "maxiter": 1000})
+    return result.x
+
+
+@pytest.mark.parametrize("seed", range(4))
+@pytest.mark.parametrize("upper", UPPERS)
+@pytest.mark.parametrize("kind", ["dense", "low_rank"])
+def test_min_variance(kind, upper, seed):
+    B, d, mu = random_problem(30, seed)
+    Sigma = covariances(B, d)[kind]
+    dense = covariances(B, d)["dense"]
+    w = ConstrainedSolver(Sigma, mu, upper=upper).min_variance()
+    assert abs(w.sum() - 1) < 1e-12
+    assert_kkt(dense, w, dense @ w, 0.0, upper, [np.ones(len(mu))])
+    reference = slsqp(dense, mu, upper)
+    assert w @ dense @ w <= reference @ dense @ reference * (1 + 1e-7)
+
+
+@pytest.mark.parametrize("seed", range(4))
+@pytest.mark.parametrize("upper", UPPERS)
+@pytest.mark.parametrize("kind", ["dense", "low_rank"])
+def test_target_return(kind, upper, seed):
+    B, d, mu = random_problem(30, seed)
+    Sigma = covariances(B, d)[kind]
+    dense = covariances(B, d)["dense"]
+    solver = ConstrainedSolver(Sigma, mu, upper=upper)
+    w_min = solver.min_variance()
+    # Several targets in a row exercise the warm start
+    r_max = mu @ _return_range(mu, solver.lower, solver.upper)[1]
+    for fraction in (0.3, 0.8, 0.1):
+        target = mu @ w_min + fraction * (r_max - mu @ w_min)
+        w = solver.target_return(target)
+        assert abs(w.sum() - 1) < 1e-12
+        assert abs(mu @ w - target) <= 1e-10 * np.abs(mu).max()
+        assert_kkt(dense, w, dense @ w, 0.0, upper, [np.ones(len(mu)), mu])
+        reference = slsqp(dense, mu, upper, target)
+        assert w @ dense @ w <= reference @ dense @ reference * (1 + 1e-6)
+
+
+@pytest.mark.parametrize("seed", range(4))
+@pytest.mark.parametrize("kind", ["dense", "low_rank"])
+def test_max_return_per_risk(kind, seed):
+    B, d, mu = random_problem(30, seed)
+    Sigma = covariances(B, d)[kind]
+    dense = covariances(B, d)["dense"]
+    w = ConstrainedSolver(Sigma, mu, upper=np.inf).max_return_per_risk()
+    # min 1/2 w'Sigma w - mu'w, w >= 0: no equality constraint
+    assert_kkt(dense, w, dense @ w - mu, 0.0, np.inf, [])
+
+
+def test_low_rank_matches_dense():
+    B, d, mu = random_problem(60, 7)
+    model = LowRankFactor(B, d)
+    for upper in UPPERS:
+        a, b = ConstrainedSolver(model, mu, upper=upper), ConstrainedSolver(model.to_dense(), mu, upper=upper)
+        np.testing.assert_allclose(a.min_variance(), b.min_variance(), atol=1e-12)
+        target = 0.5 * (mu @ a.last_weights + mu @ _return_range(mu, a.lower, a.upper)[1])
+        np.testing.assert_allclose(a.target_return(target), b.target_return(target), atol=1e-10)
+
+
+def test_frontier_with_infinite_upper_bound():
+    B, d, mu = random_problem(20, 3)
+    solver = ConstrainedSolver(LowRankFactor(B, d).to_dense(), mu, upper=np.inf)
+    w_min = solver.min_variance()
+    r_max = mu @ _return_range(mu, solver.lower, solver.upper)[1]
+    assert np.isfinite(r_max)
+    for target in np.linspace(mu @ w_min, r_max, 8):
+        w = solver.target_return(target)
+        assert np.all(np.isfinite(w)) and abs(mu @ w - target) <= 1e-10 * np.abs(mu).max()
+
+
+def test_target_return_rejects_unattainable_and_non_finite():
+    B, d, mu = random_problem(10, 0)
+    solver = ConstrainedSolver(LowRankFactor(B, d).to_dense(), mu, upper=np.inf)
+    for target in (np.nan, np.inf, mu.max() * 2):
+        with pytest.raises(ValueError):
+            solver.target_return(target)